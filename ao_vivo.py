@@ -0,0 +1,359 @@
+import os
+import sys
+import time
+import queue
+import socket
+import argparse
+import threading
+import subprocess
+import numpy as np
+
+# Formato do PCM de entrada: 16 kHz, mono, inteiro de 16 bits little-endian
+TAXA_AMOSTRAGEM = 16000
+BYTES_POR_AMOSTRA = 2
+
+# Capacidade máxima do buffer de áudio da janela deslizante (segundos)
+JANELA_MAXIMA_SEGUNDOS = 20
+
+# Intervalo entre decodificações da janela deslizante (segundos)
+PASSO_SEGUNDOS = 1.0
+
+# Segmentos que terminam antes de (fim do buffer - margem) são considerados finais
+MARGEM_FINALIZACAO_SEGUNDOS = 2.0
+
+# Quantidade de caracteres do texto finalizado usada como prompt da próxima janela
+PROMPT_CARACTERES = 200
+
+# Tamanho de cada leitura da fonte (0,1s de áudio)
+BLOCO_BYTES = TAXA_AMOSTRAGEM // 10 * BYTES_POR_AMOSTRA
+
+class BufferAudio:
+    """
+    Buffer de áudio de tamanho limitado para a janela deslizante
+
+    Guarda no máximo JANELA_MAXIMA_SEGUNDOS de áudio em um array
+    pré-alocado. `inicio` é o instante absoluto (em segundos desde o
+    começo do stream) da primeira amostra ainda presente no buffer.
+    """
+
+    def __init__(self, segundos=JANELA_MAXIMA_SEGUNDOS):
+        self.capacidade = int(segundos * TAXA_AMOSTRAGEM)
+        self.amostras = np.zeros(self.capacidade, dtype=np.float32)
+        self.tamanho = 0
+        self.amostras_descartadas = 0
+
+    @property
+    def inicio(self):
+        return self.amostras_descartadas / TAXA_AMOSTRAGEM
+
+    def adicionar(self, pcm):
+        """Adiciona PCM s16le ao final; se estourar a capacidade, descarta o áudio mais antigo"""
+        self._anexar(np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0)
+
+    def adicionar_silencio(self, n):
+        """Preenche com silêncio o lugar de `n` amostras perdidas, mantendo os tempos absolutos"""
+        if n > self.capacidade:
+            self._descartar_amostras(self.tamanho)
+            self.amostras_descartadas += n - self.capacidade
+            n = self.capacidade
+        self._anexar(np.zeros(n, dtype=np.float32))
+
+    def _anexar(self, novas):
+        if len(novas) > self.capacidade:
+            self._descartar_amostras(self.tamanho)
+            self.amostras_descartadas += len(novas) - self.capacidade
+            novas = novas[-self.capacidade:]
+        excesso = self.tamanho + len(novas) - self.capacidade
+        if excesso > 0:
+            self._descartar_amostras(excesso)
+        self.amostras[self.tamanho:self.tamanho + len(novas)] = novas
+        self.tamanho += len(novas)
+
+    def descartar(self, segundos):
+        """Remove os primeiros `segundos` de áudio do buffer"""
+        self._descartar_amostras(int(segundos * TAXA_AMOSTRAGEM))
+
+    def _descartar_amostras(self, n):
+        n = min(n, self.tamanho)
+        self.amostras[:self.tamanho - n] = self.amostras[n:self.tamanho]
+        self.tamanho -= n
+        self.amostras_descartadas += n
+
+    def duracao(self):
+        return self.tamanho / TAXA_AMOSTRAGEM
+
+    def cheio(self):
+        return self.tamanho >= self.capacidade
+
+    def dados(self):
+        return self.amostras[:self.tamanho].copy()
+
+def fonte_stdin():
+    """Lê PCM s16le 16 kHz mono da entrada padrão"""
+    while True:
+        bloco = sys.stdin.buffer.read(BLOCO_BYTES)
+        if not bloco:
+            return
+        yield bloco
+
+def fonte_socket(porta, host="127.0.0.1"):
+    """Aguarda uma conexão TCP local e lê PCM s16le 16 kHz mono dela"""
+    with socket.create_server((host, porta)) as servidor:
+        print(f"🔌 Aguardando conexão em {host}:{porta}...", file=sys.stderr)
+        conexao, _ = servidor.accept()
+        with conexao:
+            resto = b""
+            while True:
+                bloco = conexao.recv(BLOCO_BYTES)
+                if not bloco:
+                    return
+                # recv pode devolver um número ímpar de bytes: guardar a amostra incompleta
+                bloco = resto + bloco
+                corte = len(bloco) - len(bloco) % BYTES_POR_AMOSTRA
+                resto = bloco[corte:]
+                yield bloco[:corte]
+
+def fonte_ffmpeg(origem, tempo_real=False):
+    """
+    Usa o ffmpeg para converter qualquer URL/arquivo em PCM s16le 16 kHz mono
+
+    Com tempo_real=True (-re), um arquivo é reproduzido na velocidade
+    original, simulando uma fonte ao vivo para testes.
+    """
+    local_ffmpeg = os.path.join(os.getcwd(), "bin", "ffmpeg")
+    ffmpeg = local_ffmpeg if os.path.exists(local_ffmpeg) else "ffmpeg"
+    comando = [ffmpeg, "-loglevel", "error"]
+    if tempo_real:
+        comando.append("-re")
+    comando += ["-i", origem, "-f", "s16le", "-ac", "1", "-ar", str(TAXA_AMOSTRAGEM), "-"]
+
+    processo = subprocess.Popen(comando, stdout=subprocess.PIPE)
+    try:
+        while True:
+            bloco = processo.stdout.read(BLOCO_BYTES)
+            if not bloco:
+                return
+            yield bloco
+    finally:
+        processo.kill()
+        processo.wait()
+
+class _Perdas:
+    """Amostras descartadas pela thread leitora, ainda não repassadas ao buffer"""
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.amostras = 0
+
+    def somar(self, n):
+        with self.trava:
+            self.amostras += n
+
+    def retirar(self):
+        with self.trava:
+            n, self.amostras = self.amostras, 0
+        return n
+
+def _ler_fonte(fonte, fila, perdas=None):
+    """
+    Thread leitora: copia os blocos da fonte para a fila; None sinaliza o fim
+
+    Com `perdas` (fonte ao vivo) a leitura nunca é freada: com a fila
+    cheia, o bloco mais antigo é descartado e contado em `perdas`.
+    """
+    try:
+        for bloco in fonte:
+            if perdas is None:
+                fila.put(bloco)
+                continue
+            while True:
+                try:
+                    fila.put_nowait(bloco)
+                    break
+                except queue.Full:
+                    try:
+                        perdas.somar(len(fila.get_nowait()) // BYTES_POR_AMOSTRA)
+                    except queue.Empty:
+                        pass
+    finally:
+        fila.put(None)
+
+def formatar_tempo(segundos):
+    """Formata segundos como MM:SS.d"""
+    return f"{int(segundos // 60):02d}:{segundos % 60:04.1f}"
+
+def emitir_console(segmento, final):
+    """Imprime segmentos provisórios na mesma linha e os finais em linhas novas"""
+    linha = f"[{formatar_tempo(segmento['start'])} - {formatar_tempo(segmento['end'])}] {segmento['text'].strip()}"
+    if final:
+        print(f"\r\033[K✅ {linha}", flush=True)
+    else:
+        print(f"\r\033[K⏳ {linha}", end="", flush=True)
+
+def transcrever_ao_vivo(model, fonte, idioma="pt", ao_emitir=emitir_console, passo=PASSO_SEGUNDOS, margem=MARGEM_FINALIZACAO_SEGUNDOS, descartar_atrasado=True):
+    """
+    Transcreve um stream de PCM com decodificação em janela deslizante
+
+    A cada `passo` segundos a janela atual (buffer limitado) é decodificada
+    com o final do texto já confirmado como prompt. Segmentos que terminam
+    antes da margem de finalização são emitidos como finais e o áudio
+    correspondente sai do buffer; os demais são emitidos como provisórios
+    e re-decodificados na próxima janela. Com o buffer cheio a janela
+    sempre avança, mesmo que nenhum segmento possa ser confirmado.
+
+    Args:
+        model: Modelo Whisper já carregado (tiny/base recomendados em CPU)
+        fonte (iterable): Gerador de blocos PCM s16le 16 kHz mono
+        idioma (str): Código do idioma ou None para detecção automática
+        ao_emitir (callable): Recebe (segmento, final) para cada segmento emitido
+        passo (float): Intervalo entre decodificações em segundos
+        margem (float): Distância mínima do fim do buffer para finalizar um segmento
+        descartar_atrasado (bool): Para fontes ao vivo: se a decodificação atrasar,
+            descarta o áudio mais antigo da fila (virando silêncio) em vez de frear a leitura
+
+    Returns:
+        list: Segmentos finalizados, com tempos absolutos
+    """
+    # Fila limitada: se a decodificação atrasar, o áudio mais antigo é descartado
+    # (fontes ao vivo) ou a leitura da fonte é freada (arquivos)
+    fila = queue.Queue(maxsize=int(JANELA_MAXIMA_SEGUNDOS * TAXA_AMOSTRAGEM * BYTES_POR_AMOSTRA / BLOCO_BYTES))
+    perdas = _Perdas() if descartar_atrasado else None
+    leitor = threading.Thread(target=_ler_fonte, args=(fonte, fila, perdas), daemon=True)
+    leitor.start()
+
+    buffer = BufferAudio()
+    finalizados = []
+    prompt = ""
+    encerrado = False
+
+    while not encerrado:
+        inicio_passo = time.time()
+
+        # Consumir o que chegou desde o último passo, sem estourar o buffer
+        while not buffer.cheio():
+            try:
+                bloco = fila.get(timeout=passo if buffer.duracao() == 0 else 0.01)
+            except queue.Empty:
+                break
+            if bloco is None:
+                encerrado = True
+                break
+            perdidas = perdas.retirar() if perdas else 0
+            if perdidas:
+                print(f"\n⚠️ Decodificação atrasada: {perdidas / TAXA_AMOSTRAGEM:.1f}s de áudio descartados", file=sys.stderr)
+                buffer.adicionar_silencio(perdidas)
+            buffer.adicionar(bloco)
+
+        if buffer.duracao() < 0.5:
+            continue
+
+        resultado = model.transcribe(
+            buffer.dados(),
+            language=idioma,
+            initial_prompt=prompt[-PROMPT_CARACTERES:] or None,
+            condition_on_previous_text=False,
+            temperature=0.0,
+            fp16=False,
+        )
+        idioma = idioma or resultado.get("language")
+        segmentos = [s for s in resultado["segments"] if s["text"].strip()]
+
+        # Com o stream encerrado ou o buffer cheio, tudo (exceto o último, se cheio) vira final
+        limite = buffer.duracao() - margem
+        if encerrado:
+            limite = float("inf")
+        elif buffer.cheio() and segmentos:
+            limite = max(limite, segmentos[-1]["start"])
+
+        confirmar = [s for s in segmentos if s["end"] <= limite]
+        if buffer.cheio() and segmentos and not confirmar:
+            # Um único segmento ocupa a janela inteira: confirmá-lo para a janela avançar
+            confirmar = segmentos
+        provisorios = segmentos[len(confirmar):]
+        inicio_janela = buffer.inicio
+
+        for segmento in confirmar:
+            final = {
+                "id": len(finalizados),
+                "start": inicio_janela + segmento["start"],
+                "end": inicio_janela + segmento["end"],
+                "text": segmento["text"],
+            }
+            finalizados.append(final)
+            prompt += segmento["text"]
+            ao_emitir(final, True)
+
+        if confirmar:
+            buffer.descartar(confirmar[-1]["end"])
+        elif not segmentos:
+            # Silêncio: não há o que confirmar, manter só o final da janela
+            buffer.descartar(buffer.duracao() - margem)
+        if buffer.cheio():
+            # Nada pôde ser descartado (ex.: segmentos sem duração): forçar o avanço
+            buffer.descartar(passo)
+
+        if provisorios:
+            ao_emitir({
+                "start": inicio_janela + provisorios[0]["start"],
+                "end": inicio_janela + provisorios[-1]["end"],
+                "text": "".join(s["text"] for s in provisorios),
+            }, False)
+
+        # Manter o ritmo: não decodificar mais de uma vez por passo
+        espera = passo - (time.time() - inicio_passo)
+        if espera > 0 and not encerrado:
+            time.sleep(espera)
+
+    return finalizados
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcrição ao vivo com janela deslizante (PCM 16 kHz mono)")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--stdin", action="store_true", help="Lê PCM s16le 16 kHz mono da entrada padrão")
+    origem.add_argument("--socket", type=int, metavar="PORTA", help="Aguarda PCM s16le em uma porta TCP local")
+    origem.add_argument("--url", metavar="ORIGEM", help="URL ou arquivo convertido pelo ffmpeg")
+    parser.add_argument("--tempo-real", action="store_true", help="Reproduz --url na velocidade original (-re), para testes")
+    parser.add_argument("--modelo", default="tiny", choices=['tiny', 'base', 'small', 'medium', 'large'])
+    parser.add_argument("--idioma", default="pt", help="Código do idioma ('auto' para detectar)")
+    parser.add_argument("--srt", metavar="ARQUIVO", help="Salva os segmentos finalizados em SRT ao terminar")
+    args = parser.parse_args()
+
+    from main import gerar_srt
+    from memoria import carregar_modelo, inferencia_economica
+
+    if args.stdin:
+        fonte = fonte_stdin()
+    elif args.socket:
+        fonte = fonte_socket(args.socket)
+    else:
+        fonte = fonte_ffmpeg(args.url, tempo_real=args.tempo_real)
+    # Um arquivo local lido sem -re pode esperar pela decodificação; as demais fontes são ao vivo
+    descartar_atrasado = not (args.url and os.path.isfile(args.url) and not args.tempo_real)
+
+    cache_dir = os.path.join(os.getcwd(), "whisper_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"🤖 Carregando modelo Whisper '{args.modelo.upper()}'...", file=sys.stderr)
+    model = carregar_modelo(args.modelo, cache_dir)
+    print("🎙️ Transcrevendo ao vivo (Ctrl+C para encerrar)...", file=sys.stderr)
+
+    idioma = None if args.idioma == "auto" else args.idioma
+
+    # Guardar os segmentos finais à medida que saem, para não perdê-los no Ctrl+C
+    segmentos = []
+    def emitir(segmento, final):
+        emitir_console(segmento, final)
+        if final:
+            segmentos.append(segmento)
+
+    try:
+        with inferencia_economica():
+            transcrever_ao_vivo(model, fonte, idioma, ao_emitir=emitir, descartar_atrasado=descartar_atrasado)
+    except KeyboardInterrupt:
+        print("\n⚠️ Transcrição ao vivo interrompida.", file=sys.stderr)
+
+    if args.srt and segmentos:
+        nome_srt = gerar_srt({"segments": segmentos}, os.path.splitext(args.srt)[0])
+        print(f"🎬 Legendas SRT: {nome_srt}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
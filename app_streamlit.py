@@ -1,13 +1,24 @@
 import streamlit as st
-import whisper
 import os
 import tempfile
 import time
 import threading
 import glob
 import gc
+import contextlib
+import uuid
 from pathlib import Path
 from datetime import datetime, timedelta
+from memoria import escolher_modelo_por_memoria, exigir_memoria, carregar_modelo, inferencia_economica
+from cascata import transcrever_em_cascata
+from espectrograma import ativar_cache_mel, escopo_cache_mel, limpar_cache_mel, bandas_mel, LIMITE_CACHE_MB, LIMITE_CACHE_BAIXA_MEMORIA_MB
+from transcricao_compacta import TranscricaoCompacta
+from guarda import guarda_alucinacao, LIMIAR_REPETICAO, LIMIAR_COMPRESSAO
+from sondagem import sondar_audio, avaliar_job, registrar_tempo, formatar_duracao
+from sessoes import ArmazemResultados, criar_job, chave_resultado, limpar_sessoes_antigas
+from lote import ordenar_por_duracao, executar_lote, trava_modelo, NUCLEOS_PADRAO
+from traducao import transcrever_e_traduzir
+from perfis import carregar_perfil, opcoes_perfil, chave_perfil, listar_perfis
 
 # Configurar e gerenciar cache local
 def configurar_cache():
@@ -85,6 +96,9 @@ def limpar_sistema_automatico():
                 except:
                     pass
         
+        # 4. Remover resultados de sessões abandonadas há mais de 24h
+        arquivos_removidos += limpar_sessoes_antigas()
+        
         # Salvar timestamp da limpeza
         with open(arquivo_controle, "w") as f:
             f.write(agora.isoformat())
@@ -119,37 +133,9 @@ def obter_info_cache():
 
 
 
-# Função para gerar arquivo SRT
-def gerar_srt(resultado):
-    """
-    Gera conteúdo SRT (legendas) a partir do resultado da transcrição
-    
-    Args:
-        resultado (dict): Resultado da transcrição do Whisper
-    
-    Returns:
-        str: Conteúdo do arquivo SRT
-    """
-    srt_content = ""
-    
-    for i, segmento in enumerate(resultado["segments"], 1):
-        inicio = segmento["start"]
-        fim = segmento["end"]
-        texto = segmento["text"].strip()
-        
-        # Converter tempo para formato SRT (HH:MM:SS,mmm)
-        inicio_srt = f"{int(inicio//3600):02d}:{int((inicio%3600)//60):02d}:{int(inicio%60):02d},{int((inicio%1)*1000):03d}"
-        fim_srt = f"{int(fim//3600):02d}:{int((fim%3600)//60):02d}:{int(fim%60):02d},{int((fim%1)*1000):03d}"
-        
-        srt_content += f"{i}\n"
-        srt_content += f"{inicio_srt} --> {fim_srt}\n"
-        srt_content += f"{texto}\n\n"
-    
-    return srt_content
-
 # Função para carregar modelo com cache otimizado
 @st.cache_resource(ttl=3600, max_entries=2)  # Cache por 1 hora, máximo 2 modelos
-def carregar_modelo_whisper(modelo):
+def carregar_modelo_whisper(modelo, baixa_memoria=False):
     """Carrega o modelo Whisper com cache para melhor performance"""
     cache_dir = configurar_cache()
     
@@ -160,24 +146,29 @@ def carregar_modelo_whisper(modelo):
     import gc
     gc.collect()
     
-    return whisper.load_model(modelo, download_root=cache_dir)
+    return carregar_modelo(modelo, cache_dir, baixa_memoria=baixa_memoria)
 
 # Função para liberar memória após transcrição
 def liberar_memoria():
     """Libera memória não utilizada"""
-    import gc
+    # Mover para o disco os resultados que não estão na tela (continuam acessíveis pelo id)
+    if 'resultados' in st.session_state:
+        st.session_state.resultados.descarregar(manter=st.session_state.get('job_atual'))
+    # Só os log-mel desta sessão: os de outras sessões (ex.: um lote em andamento) ficam
+    if 'sessao_id' in st.session_state:
+        limpar_cache_mel(st.session_state.sessao_id)
     gc.collect()
-    
-    # Limpar cache do Streamlit se necessário
-    if len(st.session_state) > 10:
-        keys_antigas = list(st.session_state.keys())[:-5]  # Manter apenas as 5 mais recentes
-        for key in keys_antigas:
-            if key not in ['modelo_cache', 'configuracao']:
-                del st.session_state[key]
 
 # Função para transcrever áudio com progresso realista
-def transcrever_audio(arquivo_audio, modelo_nome, idioma="pt"):
+def transcrever_audio(arquivo_audio, modelo_nome, idioma="pt", baixa_memoria=False, estimativa=None, modelo_cascata=None, guarda=None, traduzir=False, opcoes=None):
     """Transcreve o arquivo de áudio usando o modelo Whisper selecionado"""
+    opcoes = opcoes or {}
+    
+    # No modo de baixa memória, recusar ou rebaixar o modelo antes de carregar
+    if baixa_memoria:
+        modelo_nome, aviso = escolher_modelo_por_memoria(modelo_nome, baixa_memoria=True)
+        if aviso:
+            st.warning(f"⚠️ {aviso}")
     
     # Criar containers para progresso
     progress_container = st.container()
@@ -208,7 +199,7 @@ def transcrever_audio(arquivo_audio, modelo_nome, idioma="pt"):
             status_container.markdown(f'<div class="progress-status">🤖 Carregando modelo {modelo_nome.upper()}...</div>', unsafe_allow_html=True)
             time.sleep(0.05)
         
-        modelo = carregar_modelo_whisper(modelo_nome)
+        modelo = carregar_modelo_whisper(modelo_nome, baixa_memoria)
         
         # Fase 3: Preparando áudio (25-35%)
         for i in range(26, 36):
@@ -224,21 +215,55 @@ def transcrever_audio(arquivo_audio, modelo_nome, idioma="pt"):
         import threading
         progresso_atual = [35]  # Lista para permitir modificação na thread
         
+        # Ritmo da barra baseado no tempo estimado pela sondagem (50 passos de 35% a 85%)
+        intervalo = max(0.3, estimativa / 50) if estimativa else 0.3
+        
         def atualizar_progresso():
             while progresso_atual[0] < 85:
                 progresso_atual[0] += 1
                 progress_bar.progress(progresso_atual[0])
                 percentage_container.markdown(f'<div class="progress-percentage">{progresso_atual[0]}%</div>', unsafe_allow_html=True)
                 status_container.markdown(f'<div class="progress-status">🎤 Processando áudio... Analisando segmentos</div>', unsafe_allow_html=True)
-                time.sleep(0.3)  # Progresso mais lento para parecer realista
+                time.sleep(intervalo)
         
         # Iniciar thread de progresso
         thread_progresso = threading.Thread(target=atualizar_progresso)
         thread_progresso.daemon = True
         thread_progresso.start()
         
-        # Executar transcrição
-        resultado = modelo.transcribe(arquivo_audio, language=idioma)
+        # Executar transcrição (só este trecho é medido para o histórico de tempo real);
+        # o modelo em cache é compartilhado com outras sessões e com o lote
+        with trava_modelo, inferencia_economica(), contextlib.ExitStack() as pilha:
+            inicio_inferencia = time.time()
+            # Na cascata, reaproveitar o log-mel entre os dois modelos se usarem as mesmas bandas
+            if modelo_cascata and not traduzir and bandas_mel(modelo_nome) == bandas_mel(modelo_cascata):
+                pilha.enter_context(escopo_cache_mel(st.session_state.sessao_id))
+            protecao = pilha.enter_context(guarda_alucinacao(modelo, **guarda)) if guarda is not None else None
+            # A guarda envolve uma cópia rasa do modelo; o modelo em cache não é alterado
+            modelo_ativo = protecao.modelo if protecao else modelo
+            if traduzir:
+                resultado = transcrever_e_traduzir(modelo_ativo, arquivo_audio, idioma, **opcoes)
+            elif modelo_cascata:
+                def carregar(nome):
+                    nonlocal modelo, modelo_ativo
+                    if nome == modelo_nome:
+                        return modelo_ativo
+                    if baixa_memoria:
+                        # A primeira passada terminou: tirar o modelo rápido do cache antes de checar a folga
+                        modelo = modelo_ativo = None
+                        if protecao:
+                            protecao.modelo = None
+                        carregar_modelo_whisper.clear()
+                        gc.collect()
+                        exigir_memoria(nome, baixa_memoria=True)
+                    return carregar_modelo_whisper(nome, baixa_memoria)
+                resultado = transcrever_em_cascata(carregar, arquivo_audio, modelo_nome, modelo_cascata, idioma, **opcoes)
+            else:
+                resultado = modelo_ativo.transcribe(arquivo_audio, language=idioma, **opcoes)
+            if protecao:
+                protecao.filtrar_segmentos(resultado)
+        resultado["tempo_inferencia"] = time.time() - inicio_inferencia
+        resultado.setdefault("modelo", modelo_nome)
         
         # Parar thread de progresso
         progresso_atual[0] = 85
@@ -276,6 +301,180 @@ def transcrever_audio(arquivo_audio, modelo_nome, idioma="pt"):
     
     return resultado
 
+# Tabela paginada: só a página visível é montada a partir dos arrays da transcrição
+def mostrar_segmentos(compacta, chave, altura=400):
+    """Mostra uma página da tabela de segmentos, com seletor quando há mais de uma"""
+    total = compacta.total_paginas()
+    pagina = 1
+    if total > 1:
+        pagina = st.number_input(f"Página (de {total})", min_value=1, max_value=total, value=1, step=1, key=chave)
+    st.dataframe(compacta.pagina(pagina - 1), hide_index=True, use_container_width=True, height=altura)
+
+# Função para exibir um job concluído a partir do armazém de resultados
+def renderizar_resultados(job):
+    """Mostra abas, downloads e estatísticas de um job (sem recalcular nada)"""
+    compacta = job["compacta"]
+    metadados = compacta.metadados
+    nome_base = Path(job["arquivo"]).stem
+    
+    # Área de resultados
+    st.header("📄 Resultados da Transcrição")
+    
+    # Tabs para diferentes visualizações (a aba em inglês só aparece se houve tradução)
+    traducao = job.get("traducao")
+    nomes_abas = ["🔤 Texto Completo", "⏰ Por Segmentos", "📊 Estatísticas"]
+    if traducao is not None:
+        nomes_abas.insert(2, "🌍 Inglês")
+    abas = st.tabs(nomes_abas)
+    tab1, tab2, tab3 = abas[0], abas[1], abas[-1]
+    
+    if traducao is not None:
+        with abas[2]:
+            st.subheader("Tradução para o Inglês")
+            st.text_area(
+                "Texto traduzido:",
+                traducao.texto_completo,
+                height=300,
+                help="Tradução gerada na mesma passada da transcrição, com timestamps próprios"
+            )
+            mostrar_segmentos(traducao, f"pagina_en_{job['id']}", altura=300)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="⬇️ Baixar Tradução (TXT)",
+                    data=job["downloads"]["en_transcricao.txt"],
+                    file_name=f"{nome_base}_en_transcricao.txt",
+                    mime="text/plain",
+                    key=f"download_en_1_{job['id']}"
+                )
+            with col2:
+                st.download_button(
+                    label="🎬 Baixar Legendas em Inglês (SRT)",
+                    data=job["downloads"]["en_legendas.srt"],
+                    file_name=f"{nome_base}_en_legendas.srt",
+                    mime="text/plain",
+                    key=f"download_en_2_{job['id']}"
+                )
+    
+    with tab1:
+        st.subheader("Transcrição Completa")
+        texto_completo = compacta.texto_completo
+        st.text_area(
+            "Texto transcrito:",
+            texto_completo,
+            height=400,
+            help="Você pode copiar este texto ou fazer download abaixo"
+        )
+        
+        # Botões de download
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.download_button(
+                label="⬇️ Baixar Transcrição (TXT)",
+                data=job["downloads"]["transcricao.txt"],
+                file_name=f"{nome_base}_transcricao.txt",
+                mime="text/plain",
+                key=f"download_1_{job['id']}"
+            )
+        
+        with col2:
+            st.download_button(
+                label="🎬 Baixar Legendas (SRT)",
+                data=job["downloads"]["legendas.srt"],
+                file_name=f"{nome_base}_legendas.srt",
+                mime="text/plain",
+                key=f"download_2_{job['id']}"
+            )
+    
+    with tab2:
+        st.subheader("Transcrição por Segmentos")
+        
+        mostrar_segmentos(compacta, f"pagina_{job['id']}")
+        
+        # Botões de download dos segmentos
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.download_button(
+                label="⬇️ Baixar Segmentos (TXT)",
+                data=job["downloads"]["segmentos.txt"],
+                file_name=f"{nome_base}_segmentos.txt",
+                mime="text/plain",
+                key=f"download_3_{job['id']}"
+            )
+        
+        with col2:
+            st.download_button(
+                label="🎬 Baixar Legendas (SRT)",
+                data=job["downloads"]["legendas.srt"],
+                file_name=f"{nome_base}_legendas.srt",
+                mime="text/plain",
+                key=f"download_4_{job['id']}"
+            )
+    
+    with tab3:
+        st.subheader("Estatísticas da Transcrição")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("⏱️ Duração", f"{len(compacta)} segmentos")
+        
+        with col2:
+            duracao_total = compacta.duracao
+            st.metric("🕐 Tempo Total", f"{int(duracao_total//60):02d}:{int(duracao_total%60):02d}")
+        
+        with col3:
+            palavras = len(texto_completo.split())
+            st.metric("💬 Palavras", f"{palavras}")
+        
+        with col4:
+            st.metric("⚡ Processamento", f"{job['tempo_processamento']:.1f}s")
+        
+        # Informações adicionais
+        st.write("**Detalhes técnicos:**")
+        st.write(f"• Modelo usado: **{metadados.get('modelo', job['modelo']).upper()}**")
+        st.write(f"• Idioma detectado: **{metadados.get('language', 'N/A')}**")
+        st.write(f"• Arquivo processado: **{job['arquivo']}**")
+        if job.get("perfil"):
+            st.write(f"• Perfil de vocabulário: **{job['perfil']}**")
+        if "cascata" in metadados:
+            cascata = metadados["cascata"]
+            st.write(f"• Cascata: **{cascata['segmentos_incertos']}** segmentos incertos refeitos com "
+                     f"**{cascata['modelo_preciso'].upper()}** em {len(cascata['intervalos'])} trechos")
+        if "guarda" in metadados:
+            protecao = metadados["guarda"]
+            st.write(f"• Guarda: **{protecao['janelas_cortadas']}** janelas cortadas, "
+                     f"**{len(protecao['segmentos_removidos'])}** segmentos repetidos removidos")
+            for evento in protecao["eventos"]:
+                st.caption(f"✂️ {evento['motivo']}: \"{evento['texto']}\"")
+
+# Função para sondar duração/codec uma única vez por upload, sem decodificar o áudio
+def sondar_upload(arquivo):
+    """Retorna as informações do áudio enviado (ou None se o ffprobe falhar)"""
+    chave = f"{arquivo.name}-{arquivo.size}"
+    sondagens = st.session_state.setdefault('sondagens', {})
+    if chave in sondagens:
+        return sondagens[chave]
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=Path(arquivo.name).suffix) as tmp_file:
+        tmp_file.write(arquivo.getvalue())
+        caminho = tmp_file.name
+    try:
+        info = sondar_audio(caminho)
+    except ValueError as e:
+        st.error(f"❌ {e}")
+        st.stop()
+    except RuntimeError:
+        info = None
+    finally:
+        os.unlink(caminho)
+    
+    sondagens[chave] = info
+    return info
+
 # Configuração da página
 st.set_page_config(
     page_title="Transcritor de Áudio com Whisper",
@@ -287,6 +486,10 @@ st.set_page_config(
 if 'sessao_ativa' not in st.session_state:
     st.session_state.sessao_ativa = True
     st.session_state.contador_transcricoes = 0
+    # Resultados concluídos ficam guardados por id e sobrevivem aos reruns
+    st.session_state.sessao_id = uuid.uuid4().hex
+    st.session_state.resultados = ArmazemResultados(st.session_state.sessao_id)
+    st.session_state.job_atual = None
     # Executar limpeza automática de 24h na inicialização
     arquivos_removidos = limpar_sistema_automatico()
     if arquivos_removidos > 0:
@@ -373,26 +576,34 @@ st.info("""
 # Interface principal
 st.header("📁 Selecione seu arquivo de áudio")
 
-# Upload de arquivo com validação
-arquivo_uploaded = st.file_uploader(
-    "Escolha um arquivo de áudio:",
+# Upload de arquivos com validação
+arquivos_uploaded = st.file_uploader(
+    "Escolha um ou mais arquivos de áudio:",
     type=['mp3', 'wav', 'm4a', 'flac', 'ogg', 'wma'],
-    help="Formatos suportados: MP3, WAV, M4A, FLAC, OGG, WMA (máx. 200MB)"
+    accept_multiple_files=True,
+    help="Formatos suportados: MP3, WAV, M4A, FLAC, OGG, WMA (máx. 200MB cada). Vários arquivos são processados em lote"
 )
 
-# Validação do arquivo
-if arquivo_uploaded is not None:
+# Validação dos arquivos
+for arquivo in arquivos_uploaded:
     # Verificar tamanho do arquivo (máximo 200MB)
     max_size = 200 * 1024 * 1024  # 200MB em bytes
-    if arquivo_uploaded.size > max_size:
-        st.error(f"❌ Arquivo muito grande! Tamanho máximo: 200MB. Seu arquivo: {arquivo_uploaded.size / (1024*1024):.1f}MB")
+    if arquivo.size > max_size:
+        st.error(f"❌ Arquivo muito grande! Tamanho máximo: 200MB. {arquivo.name}: {arquivo.size / (1024*1024):.1f}MB")
         st.stop()
     
     # Verificar se o nome do arquivo é válido
-    if not arquivo_uploaded.name or len(arquivo_uploaded.name) == 0:
+    if not arquivo.name or len(arquivo.name) == 0:
         st.error("❌ Nome do arquivo inválido!")
         st.stop()
 
+# Um arquivo segue o fluxo individual; vários formam um lote
+arquivo_uploaded = arquivos_uploaded[0] if len(arquivos_uploaded) == 1 else None
+lote = arquivos_uploaded if len(arquivos_uploaded) > 1 else []
+
+# Sondar o áudio enviado (duração, codec) para admissão e estimativa de tempo
+info_audio = sondar_upload(arquivo_uploaded) if arquivo_uploaded is not None else None
+
 st.header("⚙️ Configurações")
 
 # Seletor de modelo
@@ -403,7 +614,64 @@ modelo_selecionado = st.selectbox(
     help="Modelos maiores são mais precisos, mas mais lentos"
 )
 
+# Modo cascata: modelo rápido + re-transcrição dos trechos incertos com um modelo maior
+usar_cascata = st.checkbox(
+    "🪜 Modo cascata",
+    value=False,
+    help="Transcreve com o modelo escolhido e refaz apenas os trechos de baixa confiança com um modelo maior"
+)
+modelo_cascata = None
+if usar_cascata:
+    modelo_cascata = st.selectbox(
+        "Modelo para os trechos incertos:",
+        ["small", "medium", "large"],
+        index=2,
+        help="Usado só nos segmentos com baixa confiança (avg_logprob, no_speech_prob, compression_ratio)"
+    )
+
+# Guarda contra loops de repetição/alucinação em trechos ruidosos ou silenciosos
+with st.expander("🛡️ Proteção contra alucinações"):
+    usar_guarda = st.checkbox(
+        "Cortar repetições e loops",
+        value=True,
+        help="Interrompe janelas que repetem o texto anterior ou têm taxa de compressão muito alta, pulando para a próxima"
+    )
+    guarda_repeticao = st.slider(
+        "Repetição máxima de n-gramas", 0.5, 1.0, LIMIAR_REPETICAO, 0.05,
+        help="Fração dos n-gramas de uma janela já vistos nas anteriores a partir da qual ela é cortada"
+    )
+    guarda_compressao = st.slider(
+        "Taxa de compressão máxima", 2.4, 5.0, LIMIAR_COMPRESSAO, 0.1,
+        help="Janelas acima desta taxa são cortadas sem tentar outras temperaturas"
+    )
+guarda = {"limiar_repeticao": guarda_repeticao, "limiar_compressao": guarda_compressao} if usar_guarda else None
 
+# Saída dupla: transcrição + tradução para o inglês reaproveitando o encoder de cada janela
+traduzir = st.checkbox(
+    "🌍 Também traduzir para o inglês",
+    value=False,
+    help="Gera TXT/SRT em inglês alinhados à transcrição, decodificando as duas tarefas sobre a mesma saída do encoder"
+)
+if traduzir and modelo_cascata:
+    st.caption("ℹ️ Com a tradução ativa, o modo cascata não é aplicado")
+
+# Modo de baixa memória para servidores com pouca RAM
+baixa_memoria = st.checkbox(
+    "💾 Modo baixa memória",
+    value=False,
+    help="Mapeia os pesos do modelo a partir do disco e verifica a RAM livre antes de carregar; se não couber, usa um modelo menor"
+)
+
+# Limite do cache de log-mel (cascata, lote adiantado); menor no modo de baixa memória
+ativar_cache_mel(LIMITE_CACHE_BAIXA_MEMORIA_MB if baixa_memoria else LIMITE_CACHE_MB)
+
+
+# Roteamento por tempo: se a estimativa passar do limite, um modelo mais rápido é usado
+tempo_maximo = st.number_input(
+    "⏱️ Tempo máximo de processamento (s)",
+    min_value=0, value=0, step=60,
+    help="0 = sem limite. Para um arquivo individual, se o tempo estimado com o modelo escolhido passar disso, um modelo mais rápido é usado"
+) or None
 
 # Seletor de idioma
 idioma_selecionado = st.selectbox(
@@ -420,150 +688,244 @@ idioma_selecionado = st.selectbox(
     format_func=lambda x: x[1],
     help="Escolha o idioma do áudio ou deixe em 'Detectar automaticamente'"
 )
+idioma_codigo = idioma_selecionado[0] if idioma_selecionado[0] != "auto" else None
+
+# Perfil de vocabulário: prompt inicial com nomes/jargão, tokens suprimidos, beam size e temperaturas
+nome_perfil = st.selectbox(
+    "📚 Perfil de vocabulário:",
+    ["(nenhum)"] + listar_perfis(),
+    help="Perfis ficam em perfis/NOME.json e ajudam o Whisper a acertar nomes de produtos e termos técnicos"
+)
+perfil = None
+if nome_perfil != "(nenhum)":
+    try:
+        perfil = carregar_perfil(nome_perfil)
+        if perfil.get("descricao"):
+            st.caption(f"📚 {perfil['descricao']}")
+    except (FileNotFoundError, ValueError) as e:
+        st.error(f"❌ {e}")
+opcoes_decodificacao = opcoes_perfil(perfil)
+
+# Tudo que altera o resultado entra na chave do cache de resultados da sessão
+configuracao = {
+    "modelo": modelo_selecionado,
+    "idioma": idioma_codigo,
+    "perfil": chave_perfil(perfil),
+    "cascata": modelo_cascata,
+    "guarda": guarda,
+    "traducao": traduzir,
+    "baixa_memoria": baixa_memoria,
+    "tempo_maximo": tempo_maximo,
+}
 
 # Área de processamento
 if arquivo_uploaded is not None and arquivo_uploaded.size <= 200 * 1024 * 1024:
     st.success(f"✅ Arquivo carregado: **{arquivo_uploaded.name}**")
     
+    # Admitir o job com base na duração e estimar o tempo de processamento
+    avaliacao = avaliar_job(info_audio, modelo_selecionado, tempo_maximo=tempo_maximo) if info_audio else None
+    if avaliacao and not avaliacao["aceito"]:
+        st.error(f"❌ {avaliacao['motivo']}")
+        st.stop()
+    
+    # Modelo efetivo: pode ter sido roteado para um mais rápido pelo tempo máximo
+    modelo_efetivo = avaliacao["modelo"] if avaliacao else modelo_selecionado
+    if avaliacao and avaliacao["motivo"]:
+        st.warning(f"⚠️ {avaliacao['motivo']}")
+    
     # Mostrar informações do arquivo
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4, col5 = st.columns(5)
     with col1:
         st.metric("📁 Arquivo", arquivo_uploaded.name)
     with col2:
         st.metric("📊 Tamanho", f"{arquivo_uploaded.size / (1024*1024):.1f} MB")
     with col3:
-        st.metric("🎛️ Modelo", modelo_selecionado.upper())
+        st.metric("⏱️ Duração", formatar_duracao(info_audio["duracao"]) if info_audio else "N/A")
+    with col4:
+        st.metric("🎛️ Modelo", modelo_efetivo.upper())
+    with col5:
+        st.metric("⏳ Tempo estimado", f"~{formatar_duracao(avaliacao['estimativa'])}" if avaliacao else "N/A")
+    
+    if info_audio:
+        st.caption(f"🎵 {info_audio['codec']} • {info_audio['sample_rate']} Hz • {info_audio['canais']} canal(is)")
     
     # Botão para processar
     if st.button("🚀 Iniciar Transcrição", type="primary", use_container_width=True):
-        try:
-            # Salvar arquivo temporário
-            with tempfile.NamedTemporaryFile(delete=False, suffix=Path(arquivo_uploaded.name).suffix) as tmp_file:
-                tmp_file.write(arquivo_uploaded.getvalue())
-                caminho_temp = tmp_file.name
-            
-            # Configurar idioma
-            idioma_codigo = idioma_selecionado[0] if idioma_selecionado[0] != "auto" else None
-            
-            # Processar transcrição
-            inicio_tempo = time.time()
-            resultado = transcrever_audio(caminho_temp, modelo_selecionado, idioma_codigo)
-            tempo_processamento = time.time() - inicio_tempo
-            
-            # Limpar arquivo temporário
-            os.unlink(caminho_temp)
-            
-            # Mostrar resultados
-            st.success(f"✅ Transcrição concluída em {tempo_processamento:.1f} segundos!")
-            
-            # Área de resultados
-            st.header("📄 Resultados da Transcrição")
-            
-            # Tabs para diferentes visualizações
-            tab1, tab2, tab3 = st.tabs(["🔤 Texto Completo", "⏰ Por Segmentos", "📊 Estatísticas"])
-            
-            with tab1:
-                st.subheader("Transcrição Completa")
-                texto_completo = resultado["text"].strip()
-                st.text_area(
-                    "Texto transcrito:",
-                    texto_completo,
-                    height=400,
-                    help="Você pode copiar este texto ou fazer download abaixo"
-                )
-                
-                # Botões de download
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.download_button(
-                        label="⬇️ Baixar Transcrição (TXT)",
-                        data=texto_completo,
-                        file_name=f"{Path(arquivo_uploaded.name).stem}_transcricao.txt",
-                        mime="text/plain"
-                    )
-                
-                with col2:
-                    # Gerar conteúdo SRT
-                    srt_content = gerar_srt(resultado)
-                    st.download_button(
-                        label="🎬 Baixar Legendas (SRT)",
-                        data=srt_content,
-                        file_name=f"{Path(arquivo_uploaded.name).stem}_legendas.srt",
-                        mime="text/plain"
-                    )
-            
-            with tab2:
-                st.subheader("Transcrição por Segmentos")
-                
-                # Criar texto formatado com timestamps
-                texto_segmentos = ""
-                for i, segmento in enumerate(resultado["segments"], 1):
-                    inicio = int(segmento["start"])
-                    fim = int(segmento["end"])
-                    texto = segmento["text"].strip()
-                    
-                    # Mostrar no Streamlit
-                    with st.expander(f"Segmento {i}: [{inicio//60:02d}:{inicio%60:02d} - {fim//60:02d}:{fim%60:02d}]"):
-                        st.write(texto)
-                    
-                    # Adicionar ao texto para download
-                    texto_segmentos += f"{i:2d}. [{inicio//60:02d}:{inicio%60:02d} - {fim//60:02d}:{fim%60:02d}] {texto}\n"
-                
-                # Botões de download dos segmentos
-                col1, col2 = st.columns(2)
-                
-                with col1:
-                    st.download_button(
-                        label="⬇️ Baixar Segmentos (TXT)",
-                        data=texto_segmentos,
-                        file_name=f"{Path(arquivo_uploaded.name).stem}_segmentos.txt",
-                        mime="text/plain"
-                    )
-                
-                with col2:
-                    # Gerar conteúdo SRT para segmentos
-                    srt_content = gerar_srt(resultado)
-                    st.download_button(
-                        label="🎬 Baixar Legendas (SRT)",
-                        data=srt_content,
-                        file_name=f"{Path(arquivo_uploaded.name).stem}_legendas.srt",
-                        mime="text/plain"
-                    )
-            
-            with tab3:
-                st.subheader("Estatísticas da Transcrição")
+        # Mesmo áudio com a mesma configuração (modelo, perfil...) já transcrito nesta sessão
+        chave = chave_resultado(arquivo_uploaded.getvalue(), **configuracao)
+        job_existente = st.session_state.resultados.procurar(chave)
+        if job_existente:
+            st.session_state.job_atual = job_existente
+            st.info("♻️ Este áudio já foi transcrito nesta sessão com a mesma configuração; resultado reaproveitado")
+        else:
+            try:
+                # Salvar arquivo temporário
+                with tempfile.NamedTemporaryFile(delete=False, suffix=Path(arquivo_uploaded.name).suffix) as tmp_file:
+                    tmp_file.write(arquivo_uploaded.getvalue())
+                    caminho_temp = tmp_file.name
                 
-                col1, col2, col3, col4 = st.columns(4)
+                # Processar transcrição
+                inicio_tempo = time.time()
+                resultado = transcrever_audio(caminho_temp, modelo_efetivo, idioma_codigo, baixa_memoria,
+                                              avaliacao["estimativa"] if avaliacao else None, modelo_cascata, guarda, traduzir,
+                                              opcoes_decodificacao)
+                tempo_processamento = time.time() - inicio_tempo
+                tempo_inferencia = resultado.pop("tempo_inferencia", tempo_processamento)
                 
-                with col1:
-                    st.metric("⏱️ Duração", f"{len(resultado['segments'])} segmentos")
+                # Alimentar o histórico de fatores de tempo real (só a inferência, sem animação nem carregamento)
+                if info_audio and "cascata" not in resultado and "traducao" not in resultado:
+                    registrar_tempo(resultado.get("modelo", modelo_efetivo), info_audio["duracao"], tempo_inferencia)
                 
-                with col2:
-                    duracao_total = resultado["segments"][-1]["end"] if resultado["segments"] else 0
-                    st.metric("🕐 Tempo Total", f"{int(duracao_total//60):02d}:{int(duracao_total%60):02d}")
+                # Limpar arquivo temporário
+                os.unlink(caminho_temp)
                 
-                with col3:
-                    palavras = len(texto_completo.split())
-                    st.metric("💬 Palavras", f"{palavras}")
+                st.success(f"✅ Transcrição concluída em {tempo_processamento:.1f} segundos!")
                 
-                with col4:
-                    st.metric("⚡ Processamento", f"{tempo_processamento:.1f}s")
+                # Representação compacta: arrays + um buffer de texto, em vez de um dict por segmento
+                traducao = resultado.pop("traducao", None)
+                compacta = TranscricaoCompacta.de_resultado(resultado)
+                compacta_en = TranscricaoCompacta.de_resultado(traducao) if traducao else None
+                del resultado, traducao  # liberar a lista de segmentos (tokens, floats) do Whisper
                 
-                # Informações adicionais
-                st.write("**Detalhes técnicos:**")
-                st.write(f"• Modelo usado: **{modelo_selecionado.upper()}**")
-                st.write(f"• Idioma detectado: **{resultado.get('language', 'N/A')}**")
-                st.write(f"• Arquivo processado: **{arquivo_uploaded.name}**")
+                # Guardar o job no armazém da sessão: os resultados sobrevivem a reruns
+                job = criar_job(compacta, arquivo_uploaded.name, modelo_efetivo, idioma_codigo, tempo_processamento,
+                                traducao=compacta_en, chave=chave, perfil=nome_perfil if perfil else None)
+                st.session_state.resultados.guardar(job)
+                st.session_state.job_atual = job["id"]
+            except Exception as e:
+                st.error(f"❌ Erro durante a transcrição: {str(e)}")
+                st.write("💡 Possíveis soluções:")
+                st.write("• **Erro 403**: Arquivo muito grande ou com nome inválido - tente renomear sem caracteres especiais")
+                st.write("• **Arquivo corrompido**: Verifique se o arquivo não está danificado")
+                st.write("• **Formato não suportado**: Use MP3, WAV, M4A, FLAC, OGG ou WMA")
+                st.write("• **Memória insuficiente**: Tente usar um modelo menor (tiny ou base)")
+                st.write("• **Tamanho**: Arquivos devem ter no máximo 200MB")
+
+elif lote:
+    st.success(f"✅ {len(lote)} arquivos carregados")
+    
+    # Sondar e admitir cada arquivo; a fila roda do mais curto para o mais longo
+    itens = []
+    for arquivo in lote:
+        info = sondar_upload(arquivo)
+        avaliacao = avaliar_job(info, modelo_selecionado) if info else None
+        recusado = avaliacao is not None and not avaliacao["aceito"]
+        itens.append({
+            "arquivo": arquivo,
+            "duracao": info["duracao"] if info else None,
+            "estimativa": avaliacao["estimativa"] if avaliacao else None,
+            "aceito": not recusado,
+            "status": f"❌ {avaliacao['motivo']}" if recusado else "⏳ Na fila",
+        })
+    itens = ordenar_por_duracao(itens)
+    
+    def tabela_lote():
+        """Colunas da tabela de status do lote"""
+        return {
+            "#": list(range(1, len(itens) + 1)),
+            "Arquivo": [item["arquivo"].name for item in itens],
+            "Duração": [formatar_duracao(item["duracao"]) if item["duracao"] else "N/A" for item in itens],
+            "Estimativa": [f"~{formatar_duracao(item['estimativa'])}" if item["estimativa"] else "N/A" for item in itens],
+            "Status": [item["status"] for item in itens],
+        }
+    
+    # Orçamento de núcleos: preparação em paralelo (ffmpeg + log-mel) e threads do torch na inferência
+    nucleos = st.slider(
+        "🧵 Núcleos do lote",
+        1, os.cpu_count() or 1, min(NUCLEOS_PADRAO, os.cpu_count() or 1),
+        help="Arquivos seguintes são decodificados em paralelo enquanto o atual é transcrito; a inferência usa um único modelo, um arquivo por vez, limitada ao mesmo número de threads"
+    )
+    
+    aceitos = [item for item in itens if item["aceito"]]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("📁 Arquivos", f"{len(aceitos)}/{len(itens)}")
+    with col2:
+        st.metric("⏱️ Duração total", formatar_duracao(sum(item["duracao"] or 0 for item in aceitos)))
+    with col3:
+        st.metric("⏳ Tempo estimado", f"~{formatar_duracao(sum(item['estimativa'] or 0 for item in aceitos))}")
+    
+    tabela_status = st.empty()
+    tabela_status.dataframe(tabela_lote(), hide_index=True, use_container_width=True)
+    
+    if modelo_cascata:
+        st.caption("ℹ️ O modo cascata não é aplicado no lote; cada arquivo usa apenas o modelo escolhido")
+    
+    # Botão para processar o lote
+    if st.button("🚀 Transcrever Lote", type="primary", use_container_width=True, disabled=not aceitos):
+        ids_lote = []
+        
+        # Arquivos já transcritos nesta sessão com a mesma configuração são reaproveitados
+        a_executar = []
+        for item in aceitos:
+            item["chave"] = chave_resultado(item["arquivo"].getvalue(), **{**configuracao, "cascata": None})
+            job_existente = st.session_state.resultados.procurar(item["chave"])
+            if job_existente:
+                ids_lote.append(job_existente)
+                item["status"] = "♻️ Reaproveitado"
+            else:
+                a_executar.append(item)
+        tabela_status.dataframe(tabela_lote(), hide_index=True, use_container_width=True)
         
+        try:
+            # Salvar arquivos temporários
+            for item in a_executar:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=Path(item["arquivo"].name).suffix) as tmp_file:
+                    tmp_file.write(item["arquivo"].getvalue())
+                    item["caminho"] = tmp_file.name
+            
+            # Um único modelo carregado para todo o lote (só se algum arquivo ainda precisar ser transcrito)
+            nome_modelo, modelo = modelo_selecionado, None
+            if a_executar:
+                if baixa_memoria:
+                    nome_modelo, aviso = escolher_modelo_por_memoria(nome_modelo, baixa_memoria=True)
+                    if aviso:
+                        st.warning(f"⚠️ {aviso}")
+                with st.spinner(f"🤖 Carregando modelo {nome_modelo.upper()}..."):
+                    modelo = carregar_modelo_whisper(nome_modelo, baixa_memoria)
+            
+            inicio_item = time.time()
+            caminhos = [item["caminho"] for item in a_executar]
+            for indice, estado, dados in executar_lote(modelo, caminhos, idioma_codigo, nucleos, guarda, traduzir,
+                                                       **opcoes_decodificacao):
+                item = a_executar[indice]
+                if estado == "transcrevendo":
+                    item["status"] = "🎤 Transcrevendo..."
+                    inicio_item = time.time()
+                elif estado == "erro":
+                    item["status"] = f"❌ {dados}"
+                else:
+                    tempo_processamento = time.time() - inicio_item
+                    dados.setdefault("modelo", nome_modelo)
+                    tempo_inferencia = dados.pop("tempo_inferencia", tempo_processamento)
+                    if item["duracao"] and not traduzir:
+                        registrar_tempo(nome_modelo, item["duracao"], tempo_inferencia)
+                    
+                    traducao = dados.pop("traducao", None)
+                    compacta = TranscricaoCompacta.de_resultado(dados)
+                    compacta_en = TranscricaoCompacta.de_resultado(traducao) if traducao else None
+                    del dados, traducao
+                    job = criar_job(compacta, item["arquivo"].name, nome_modelo, idioma_codigo, tempo_processamento,
+                                    traducao=compacta_en, chave=item["chave"], perfil=nome_perfil if perfil else None)
+                    st.session_state.resultados.guardar(job)
+                    ids_lote.append(job["id"])
+                    item["status"] = f"✅ Concluído em {tempo_processamento:.1f}s"
+                tabela_status.dataframe(tabela_lote(), hide_index=True, use_container_width=True)
         except Exception as e:
-            st.error(f"❌ Erro durante a transcrição: {str(e)}")
-            st.write("💡 Possíveis soluções:")
-            st.write("• **Erro 403**: Arquivo muito grande ou com nome inválido - tente renomear sem caracteres especiais")
-            st.write("• **Arquivo corrompido**: Verifique se o arquivo não está danificado")
-            st.write("• **Formato não suportado**: Use MP3, WAV, M4A, FLAC, OGG ou WMA")
-            st.write("• **Memória insuficiente**: Tente usar um modelo menor (tiny ou base)")
-            st.write("• **Tamanho**: Arquivos devem ter no máximo 200MB")
+            st.error(f"❌ Erro durante o lote: {str(e)}")
+        finally:
+            # Limpar arquivos temporários
+            for item in a_executar:
+                if "caminho" in item and os.path.exists(item["caminho"]):
+                    os.unlink(item["caminho"])
+        
+        if ids_lote:
+            # O ZIP só é montado quando o botão de download abaixo for clicado
+            st.session_state.lote_ids = ids_lote
+            st.session_state.job_atual = ids_lote[0]
+            st.session_state.contador_transcricoes += len(ids_lote)
+            liberar_memoria()
+            st.success(f"✅ Lote concluído: {len(ids_lote)} de {len(aceitos)} arquivos transcritos")
 
 else:
     st.info("👆 Faça upload de um arquivo de áudio para começar!")
@@ -579,6 +941,44 @@ else:
     with col2:
         st.write("**🎬 SRT** - Legendas com timestamps")
 
+# Resultados da sessão: lidos do armazém, então trocar widgets ou baixar arquivos não refaz nada
+jobs_sessao = st.session_state.resultados.listar()
+if st.session_state.get('lote_ids'):
+    armazem = st.session_state.resultados
+    ids_zip = list(st.session_state.lote_ids)
+
+    def gerar_zip_lote():
+        """Monta o ZIP no clique (em outra thread) e apaga o arquivo depois de lido"""
+        caminho = armazem.exportar_zip(ids_zip, f"lote_{uuid.uuid4().hex[:8]}.zip")
+        try:
+            with open(caminho, "rb") as arquivo_zip:
+                return arquivo_zip.read()
+        finally:
+            os.remove(caminho)
+
+    st.download_button(
+        label="📦 Baixar Lote Completo (ZIP)",
+        data=gerar_zip_lote,
+        file_name="transcricoes.zip",
+        mime="application/zip",
+        use_container_width=True
+    )
+if jobs_sessao:
+    ids = [j[0] for j in jobs_sessao]
+    if st.session_state.job_atual not in ids:
+        st.session_state.job_atual = ids[0]
+    if len(ids) > 1:
+        rotulos = {j[0]: f"{j[1]} ({j[2]}, {datetime.fromtimestamp(j[3]).strftime('%H:%M:%S')})" for j in jobs_sessao}
+        st.session_state.job_atual = st.selectbox(
+            "📚 Transcrições desta sessão:",
+            ids,
+            index=ids.index(st.session_state.job_atual),
+            format_func=lambda job_id: rotulos[job_id]
+        )
+    job = st.session_state.resultados.obter(st.session_state.job_atual)
+    if job:
+        renderizar_resultados(job)
+
 # Sidebar com informações do sistema
 with st.sidebar:
     st.header("📊 Informações do Sistema")
@@ -638,7 +1038,9 @@ with st.sidebar:
                     except:
                         pass
             
-            # Limpar session state
+            # Limpar resultados guardados e session state
+            st.session_state.resultados.limpar()
+            limpar_cache_mel(st.session_state.sessao_id)
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             
@@ -0,0 +1,116 @@
+import whisper
+
+# Limiares de confiança (mesmos valores padrão usados pelo Whisper no fallback de temperatura)
+LIMIAR_LOGPROB = -1.0
+LIMIAR_COMPRESSAO = 2.4
+LIMIAR_SEM_FALA = 0.6
+
+# Margem adicionada em volta de cada trecho incerto antes de re-transcrever (segundos)
+MARGEM_SEGUNDOS = 0.5
+
+def segmento_incerto(segmento, limiar_logprob=LIMIAR_LOGPROB, limiar_compressao=LIMIAR_COMPRESSAO, limiar_sem_fala=LIMIAR_SEM_FALA):
+    """
+    Indica se um segmento tem baixa confiança e deve ser re-transcrito
+
+    Args:
+        segmento (dict): Segmento retornado por model.transcribe
+
+    Returns:
+        bool: True se o segmento estiver abaixo de algum limiar de confiança
+    """
+    return (
+        segmento["avg_logprob"] < limiar_logprob
+        or segmento["compression_ratio"] > limiar_compressao
+        or segmento["no_speech_prob"] > limiar_sem_fala
+    )
+
+def agrupar_intervalos(segmentos, duracao, margem=MARGEM_SEGUNDOS):
+    """
+    Junta segmentos incertos vizinhos em intervalos contínuos
+
+    Args:
+        segmentos (list): Segmentos incertos, em ordem de início
+        duracao (float): Duração total do áudio em segundos
+        margem (float): Folga adicionada antes e depois de cada segmento
+
+    Returns:
+        list: Lista de tuplas (inicio, fim) sem sobreposição
+    """
+    intervalos = []
+    for segmento in segmentos:
+        inicio = max(0.0, segmento["start"] - margem)
+        fim = min(duracao, segmento["end"] + margem)
+        if intervalos and inicio <= intervalos[-1][1]:
+            intervalos[-1] = (intervalos[-1][0], max(intervalos[-1][1], fim))
+        else:
+            intervalos.append((inicio, fim))
+    return intervalos
+
+def _dentro(segmento, intervalos):
+    """Verifica se o ponto médio do segmento cai em algum intervalo"""
+    meio = (segmento["start"] + segmento["end"]) / 2
+    return any(inicio <= meio <= fim for inicio, fim in intervalos)
+
+def transcrever_em_cascata(carregar, caminho_audio, modelo_rapido="tiny", modelo_preciso="large", idioma="pt", **opcoes):
+    """
+    Transcreve com um modelo rápido e refaz só os trechos incertos com um modelo maior
+
+    O áudio é decodificado uma única vez. Os trechos de baixa confiança
+    são re-transcritos numa única chamada usando clip_timestamps, e os
+    segmentos novos substituem os antigos na lista de segmentos.
+
+    Args:
+        carregar (callable): Função que recebe o nome do modelo e retorna o modelo carregado
+            (pode levantar MemoryError para o modelo preciso, mantendo a primeira passada)
+        caminho_audio (str): Caminho para o arquivo de áudio
+        modelo_rapido (str): Modelo da primeira passada
+        modelo_preciso (str): Modelo usado nos trechos incertos
+        idioma (str): Código do idioma ou None para detecção automática
+        **opcoes: Opções extras repassadas para model.transcribe
+
+    Returns:
+        dict: Resultado no formato de model.transcribe, com a chave extra "cascata"
+    """
+    audio = whisper.load_audio(caminho_audio)
+    duracao = len(audio) / whisper.audio.SAMPLE_RATE
+
+    print(f"⚡ Primeira passada com '{modelo_rapido.upper()}'...")
+    resultado = carregar(modelo_rapido).transcribe(audio, language=idioma, **opcoes)
+    idioma = idioma or resultado.get("language")
+
+    incertos = [s for s in resultado["segments"] if segmento_incerto(s)]
+    intervalos = agrupar_intervalos(incertos, duracao)
+
+    refinados = []
+    if intervalos:
+        segundos = sum(fim - inicio for inicio, fim in intervalos)
+        print(f"🔁 {len(incertos)} segmentos incertos ({segundos:.0f}s); re-transcrevendo com '{modelo_preciso.upper()}'...")
+        clips = [t for intervalo in intervalos for t in intervalo]
+        try:
+            preciso = carregar(modelo_preciso)
+        except MemoryError as e:
+            # Sem memória para o modelo preciso: ficar com a primeira passada
+            print(f"⚠️  {e}; mantendo a transcrição de '{modelo_rapido.upper()}'")
+            intervalos = []
+        else:
+            refinado = preciso.transcribe(audio, language=idioma, clip_timestamps=clips, **opcoes)
+            refinados = [s for s in refinado["segments"] if _dentro(s, intervalos)]
+
+    # Substituir os segmentos dos trechos incertos pelos re-transcritos
+    segmentos = [s for s in resultado["segments"] if not _dentro(s, intervalos)] + refinados
+    segmentos.sort(key=lambda s: s["start"])
+    for i, segmento in enumerate(segmentos):
+        segmento["id"] = i
+
+    resultado["segments"] = segmentos
+    resultado["text"] = "".join(s["text"] for s in segmentos)
+    resultado["language"] = idioma
+    resultado["modelo"] = f"{modelo_rapido}+{modelo_preciso}" if intervalos else modelo_rapido
+    resultado["cascata"] = {
+        "modelo_rapido": modelo_rapido,
+        "modelo_preciso": modelo_preciso,
+        "intervalos": intervalos,
+        "segmentos_incertos": len(incertos),
+        "segmentos_refinados": len(refinados),
+    }
+    return resultado
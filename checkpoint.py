@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+import whisper
+
+# Diretório onde os checkpoints de transcrições longas são gravados
+CHECKPOINT_DIR = os.path.join(os.getcwd(), ".checkpoints")
+
+# Tamanho de cada bloco processado entre dois checkpoints (segundos)
+BLOCO_SEGUNDOS = 600
+
+# Quantidade de caracteres do texto anterior usada como prompt ao retomar
+PROMPT_CARACTERES = 500
+
+def identificar_audio(caminho_audio):
+    """
+    Gera um identificador estável para o arquivo de áudio
+
+    Usa nome, tamanho e data de modificação para não precisar ler o
+    arquivo inteiro a cada retomada.
+
+    Args:
+        caminho_audio (str): Caminho para o arquivo de áudio
+
+    Returns:
+        str: Hash hexadecimal identificando o arquivo
+    """
+    info = os.stat(caminho_audio)
+    base = f"{os.path.abspath(caminho_audio)}|{info.st_size}|{int(info.st_mtime)}"
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()[:16]
+
+def caminho_checkpoint(caminho_audio, modelo, idioma, opcoes=None):
+    """
+    Retorna o caminho do arquivo de checkpoint para este áudio/modelo/idioma
+
+    Opções de decodificação (ex.: as de um perfil de vocabulário) também
+    entram na chave, para não retomar um checkpoint feito com outras opções.
+    """
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    nome = f"{identificar_audio(caminho_audio)}_{modelo}_{idioma or 'auto'}"
+    if opcoes:
+        conteudo = json.dumps(opcoes, sort_keys=True, ensure_ascii=False, default=str)
+        nome += "_" + hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:8]
+    return os.path.join(CHECKPOINT_DIR, f"{nome}.json")
+
+def carregar_checkpoint(caminho):
+    """Carrega um checkpoint existente ou retorna None se não houver"""
+    if not os.path.exists(caminho):
+        return None
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        # Checkpoint corrompido: recomeçar do zero
+        return None
+
+def salvar_checkpoint(caminho, estado):
+    """Grava o checkpoint de forma atômica (arquivo temporário + rename)"""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(estado, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporario, caminho)
+
+def remover_checkpoint(caminho):
+    """Remove o checkpoint após a conclusão da transcrição"""
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+def transcrever_com_checkpoint(model, caminho_audio, modelo="base", idioma="pt", bloco_segundos=BLOCO_SEGUNDOS, guarda=None, **opcoes):
+    """
+    Transcreve o áudio em blocos, gravando um checkpoint após cada bloco
+
+    Cada bloco começa na posição (seek) onde o anterior parou e usa o
+    final do texto já transcrito como prompt inicial. Como o estado
+    salvo contém exatamente o seek e o texto, uma execução retomada
+    produz a mesma saída de uma execução sem interrupção. Com a guarda de
+    alucinação ativa, o estado dela (histórico de n-gramas e prompt a
+    descartar) também vai para o checkpoint.
+
+    Args:
+        model: Modelo Whisper já carregado
+        caminho_audio (str): Caminho para o arquivo de áudio
+        modelo (str): Nome do modelo (faz parte da chave do checkpoint)
+        idioma (str): Código do idioma ou None para detecção automática
+        bloco_segundos (int): Duração de cada bloco entre checkpoints
+        guarda (GuardaAlucinacao): Guarda ativa em `model`, ou None
+        **opcoes: Opções extras repassadas para model.transcribe
+
+    Returns:
+        dict: Resultado no mesmo formato de model.transcribe
+    """
+    arquivo_checkpoint = caminho_checkpoint(caminho_audio, modelo, idioma, opcoes)
+    estado = carregar_checkpoint(arquivo_checkpoint)
+
+    if estado:
+        print(f"♻️ Retomando transcrição a partir de {estado['seek']:.1f}s ({len(estado['segments'])} segmentos salvos)")
+    else:
+        estado = {"seek": 0.0, "segments": [], "language": idioma}
+    if guarda is not None and "guarda" in estado:
+        guarda.restaurar(estado["guarda"])
+
+    audio = whisper.load_audio(caminho_audio)
+    duracao = len(audio) / whisper.audio.SAMPLE_RATE
+
+    while estado["seek"] < duracao:
+        inicio = estado["seek"]
+        fim = min(inicio + bloco_segundos, duracao)
+        ultimo_bloco = fim >= duracao
+
+        # Re-semear o prompt com o final do texto já transcrito (após o vocabulário do perfil, se houver)
+        texto_anterior = "".join(s["text"] for s in estado["segments"])
+        prompt = " ".join(filter(None, [opcoes.get("initial_prompt"), texto_anterior[-PROMPT_CARACTERES:].strip()])) or None
+
+        trecho = audio[int(inicio * whisper.audio.SAMPLE_RATE):int(fim * whisper.audio.SAMPLE_RATE)]
+        resultado = model.transcribe(trecho, **{**opcoes, "language": estado["language"], "initial_prompt": prompt})
+
+        segmentos = resultado["segments"]
+        # O último segmento de um bloco intermediário pode ter sido cortado no
+        # meio de uma frase: descartá-lo e recomeçar o próximo bloco no seu início
+        if not ultimo_bloco and len(segmentos) > 1 and segmentos[-1]["start"] > 0:
+            proximo_seek = inicio + segmentos[-1]["start"]
+            segmentos = segmentos[:-1]
+        else:
+            proximo_seek = fim
+
+        for segmento in segmentos:
+            segmento["id"] = len(estado["segments"])
+            segmento["start"] += inicio
+            segmento["end"] += inicio
+            estado["segments"].append(segmento)
+
+        estado["seek"] = proximo_seek
+        estado["language"] = estado["language"] or resultado.get("language")
+        if guarda is not None:
+            estado["guarda"] = guarda.estado()
+        salvar_checkpoint(arquivo_checkpoint, estado)
+        print(f"💾 Checkpoint salvo: {min(estado['seek'], duracao):.0f}s de {duracao:.0f}s")
+
+    remover_checkpoint(arquivo_checkpoint)
+
+    return {
+        "text": "".join(s["text"] for s in estado["segments"]),
+        "segments": estado["segments"],
+        "language": estado["language"],
+    }
@@ -0,0 +1,173 @@
+import hashlib
+import importlib
+import threading
+import contextlib
+from collections import OrderedDict
+import numpy as np
+import torch
+import whisper
+from whisper.audio import N_SAMPLES
+
+# Memória máxima ocupada pelos espectrogramas em cache (MB)
+LIMITE_CACHE_MB = 1024
+
+# Limite no modo de baixa memória (o suficiente para os arquivos adiantados de um lote)
+LIMITE_CACHE_BAIXA_MEMORIA_MB = 128
+
+# Modelos que usam 128 bandas mel ("large" é o large-v3); os demais usam 80
+MODELOS_128_BANDAS = ("large", "large-v3", "turbo", "large-v3-turbo")
+
+_cache = OrderedDict()
+# Donos de cada entrada (sessão, lote, CLI): limpar um dono não afeta os outros
+_donos = {}
+_trava = threading.Lock()
+_original = None
+# Limite atual em MB; None enquanto o cache não for ativado (nada é guardado)
+_limite_mb = None
+# Dono do escopo ativo nesta thread (ver escopo_cache_mel)
+_local = threading.local()
+
+def bandas_mel(modelo):
+    """Número de bandas mel usado pelo modelo Whisper"""
+    return 128 if modelo in MODELOS_128_BANDAS else 80
+
+def chave_audio(audio, n_mels):
+    """
+    Gera a chave do cache a partir do conteúdo do áudio e da configuração mel
+
+    Para caminhos, o hash é feito sobre os bytes do arquivo (sem decodificar),
+    então o mesmo áudio salvo em outro arquivo temporário reaproveita o cache.
+
+    Args:
+        audio (str | np.ndarray | torch.Tensor): Caminho ou amostras do áudio
+        n_mels (int): Número de bandas mel (80, ou 128 no large-v3)
+
+    Returns:
+        str: Chave do cache
+    """
+    h = hashlib.sha1()
+    if isinstance(audio, str):
+        h.update(b"arquivo")
+        with open(audio, "rb") as f:
+            for bloco in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(bloco)
+    else:
+        amostras = audio.numpy() if isinstance(audio, torch.Tensor) else np.asarray(audio)
+        h.update(b"amostras")
+        h.update(np.ascontiguousarray(amostras, dtype=np.float32).data)
+    return f"{h.hexdigest()}:{n_mels}"
+
+def _tamanho_mb(mel):
+    return mel.element_size() * mel.nelement() / (1024 * 1024)
+
+def calcular_mel(audio, n_mels=80, dono=None):
+    """
+    Calcula (ou recupera do cache) o log-mel do áudio inteiro
+
+    O STFT é feito de uma vez sobre o arquivo todo (vetorizado em torch),
+    com o mesmo padding de 30s usado por model.transcribe. O cache só é
+    consultado dentro de um escopo (ou com `dono`) e com o cache ativo;
+    fora disso o áudio nem é hasheado. Uma entrada maior que o limite
+    sozinha nunca é guardada.
+
+    Args:
+        audio (str | np.ndarray | torch.Tensor): Caminho ou amostras do áudio
+        n_mels (int): Número de bandas mel do modelo (model.dims.n_mels)
+        dono (str): Dono da entrada; None usa o do escopo ativo nesta thread
+
+    Returns:
+        torch.Tensor: Log-mel com forma (n_mels, quadros) na CPU
+    """
+    dono = dono or getattr(_local, "dono", None)
+    # Tensor comum (não de inference_mode), para poder ser reutilizado em qualquer contexto
+    funcao = _original or whisper.audio.log_mel_spectrogram
+    if dono is None or not _limite_mb:
+        with torch.inference_mode(False), torch.no_grad():
+            return funcao(audio, n_mels, padding=N_SAMPLES)
+
+    chave = chave_audio(audio, n_mels)
+    with _trava:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            _donos[chave].add(dono)
+            return _cache[chave]
+
+    with torch.inference_mode(False), torch.no_grad():
+        mel = funcao(audio, n_mels, padding=N_SAMPLES)
+
+    with _trava:
+        if _limite_mb and _tamanho_mb(mel) <= _limite_mb:
+            _cache[chave] = mel
+            _donos.setdefault(chave, set()).add(dono)
+            _ajustar_ao_limite()
+    return mel
+
+def _ajustar_ao_limite():
+    """Remove os menos usados até caber no limite de memória (chamar com _trava)"""
+    while _cache and sum(_tamanho_mb(m) for m in _cache.values()) > (_limite_mb or 0):
+        chave, _ = _cache.popitem(last=False)
+        _donos.pop(chave, None)
+
+def _log_mel_com_cache(audio, n_mels=80, padding=0, device=None):
+    """Substituto de log_mel_spectrogram usado dentro de model.transcribe"""
+    if padding != N_SAMPLES or device is not None or getattr(_local, "dono", None) is None:
+        return _original(audio, n_mels, padding=padding, device=device)
+    return calcular_mel(audio, n_mels)
+
+@contextlib.contextmanager
+def escopo_cache_mel(dono):
+    """
+    Usa o cache nos log-mel calculados nesta thread durante o bloco with
+
+    As entradas criadas ou reaproveitadas ficam registradas em nome de
+    `dono`, para limpar_cache_mel(dono) remover só as dele.
+    """
+    anterior = getattr(_local, "dono", None)
+    _local.dono = dono
+    try:
+        yield
+    finally:
+        _local.dono = anterior
+
+def ativar_cache_mel(limite_mb=None):
+    """
+    Faz model.transcribe usar os espectrogramas em cache
+
+    O Whisper calcula o log-mel dentro de transcribe(); aqui a função
+    usada por ele é trocada por uma que consulta o cache antes de
+    calcular (só dentro de escopo_cache_mel). Chamadas repetidas só
+    ajustam o limite.
+
+    Args:
+        limite_mb (int): Memória máxima do cache em MB (0 desativa); None
+            mantém o limite já configurado ou usa LIMITE_CACHE_MB
+    """
+    global _original, _limite_mb
+    modulo = importlib.import_module("whisper.transcribe")
+    if _original is None:
+        _original = modulo.log_mel_spectrogram
+        modulo.log_mel_spectrogram = _log_mel_com_cache
+
+    with _trava:
+        if limite_mb is not None:
+            _limite_mb = limite_mb
+        elif _limite_mb is None:
+            _limite_mb = LIMITE_CACHE_MB
+        _ajustar_ao_limite()
+
+def limpar_cache_mel(dono=None):
+    """
+    Remove do cache as entradas de `dono` (ou todas, se None)
+
+    Uma entrada compartilhada com outro dono continua no cache para ele.
+    """
+    with _trava:
+        if dono is None:
+            _cache.clear()
+            _donos.clear()
+            return
+        for chave in [c for c, donos in _donos.items() if dono in donos]:
+            _donos[chave].discard(dono)
+            if not _donos[chave]:
+                del _donos[chave]
+                _cache.pop(chave, None)
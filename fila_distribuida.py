@@ -0,0 +1,347 @@
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+# Tempo de validade de um lease (segundos); renovado pelo heartbeat do worker
+LEASE_SEGUNDOS = 120
+
+# Número máximo de tentativas antes de marcar o job como falho
+MAX_TENTATIVAS = 3
+
+# Intervalo entre consultas quando não há job disponível (segundos)
+INTERVALO_OCIOSO = 5
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    caminho TEXT NOT NULL,
+    modelo TEXT NOT NULL,
+    idioma TEXT,
+    opcoes TEXT,
+    duracao REAL,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    worker TEXT,
+    lease_ate REAL,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    erro TEXT,
+    saida_txt TEXT,
+    saida_srt TEXT,
+    criado_em REAL NOT NULL,
+    concluido_em REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_estado ON jobs (estado, lease_ate);
+"""
+
+def conectar(caminho_db):
+    """
+    Abre o ledger SQLite com configurações seguras para sistema de arquivos compartilhado
+
+    O journal em modo DELETE (e não WAL) funciona sobre NFS/SMB, pois não
+    depende de memória compartilhada entre máquinas. As transações usam
+    BEGIN IMMEDIATE para que apenas um worker reivindique um job por vez.
+    """
+    conexao = sqlite3.connect(caminho_db, timeout=60, isolation_level=None)
+    conexao.row_factory = sqlite3.Row
+    conexao.execute("PRAGMA journal_mode=DELETE")
+    conexao.execute("PRAGMA synchronous=FULL")
+    conexao.executescript(ESQUEMA)
+    # Ledgers criados antes da coluna de opções (perfis de vocabulário)
+    colunas = {linha["name"] for linha in conexao.execute("PRAGMA table_info(jobs)")}
+    if "opcoes" not in colunas:
+        try:
+            conexao.execute("ALTER TABLE jobs ADD COLUMN opcoes TEXT")
+        except sqlite3.OperationalError as e:
+            # Outro worker migrou o ledger ao mesmo tempo
+            if "duplicate column" not in str(e):
+                raise
+    return conexao
+
+def gerar_id_worker():
+    """Identificador único do worker: máquina + processo"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def enfileirar(caminho_db, arquivos, modelo="base", idioma="pt", opcoes=None):
+    """
+    Adiciona arquivos de áudio ao ledger como jobs pendentes
+
+    A duração é sondada na hora de enfileirar para que os workers peguem
+    os jobs mais longos primeiro, equilibrando o tempo total entre os nós.
+    As opções de decodificação (de um perfil de vocabulário) são gravadas
+    no próprio job, então os workers não precisam ter o arquivo do perfil.
+
+    Returns:
+        int: Quantidade de jobs adicionados
+    """
+    from sondagem import sondar_audio
+
+    conexao = conectar(caminho_db)
+    adicionados = 0
+    for arquivo in arquivos:
+        caminho = os.path.abspath(arquivo)
+        try:
+            duracao = sondar_audio(caminho)["duracao"]
+        except (RuntimeError, ValueError):
+            duracao = None
+        conexao.execute(
+            "INSERT INTO jobs (caminho, modelo, idioma, opcoes, duracao, criado_em) VALUES (?, ?, ?, ?, ?, ?)",
+            (caminho, modelo, idioma, json.dumps(opcoes, ensure_ascii=False) if opcoes else None, duracao, time.time()),
+        )
+        adicionados += 1
+    conexao.close()
+    return adicionados
+
+def reivindicar_job(conexao, worker_id, lease=LEASE_SEGUNDOS):
+    """
+    Reivindica atomicamente o próximo job disponível
+
+    Um job está disponível se estiver pendente ou se o lease do worker
+    que o executava tiver expirado (worker morto), permitindo que outro
+    nó o assuma.
+
+    Returns:
+        sqlite3.Row: Job reivindicado ou None se não houver
+    """
+    agora = time.time()
+    conexao.execute("BEGIN IMMEDIATE")
+    try:
+        # Jobs abandonados que já esgotaram as tentativas não voltam para a fila
+        conexao.execute(
+            """UPDATE jobs SET estado = 'falhou', erro = COALESCE(erro, 'lease expirado')
+               WHERE estado = 'executando' AND lease_ate < ? AND tentativas >= ?""",
+            (agora, MAX_TENTATIVAS),
+        )
+        job = conexao.execute(
+            """SELECT * FROM jobs
+               WHERE (estado = 'pendente' OR (estado = 'executando' AND lease_ate < ?))
+                 AND tentativas < ?
+               ORDER BY duracao IS NULL, duracao DESC, id
+               LIMIT 1""",
+            (agora, MAX_TENTATIVAS),
+        ).fetchone()
+        if job is None:
+            conexao.execute("COMMIT")
+            return None
+        conexao.execute(
+            """UPDATE jobs SET estado = 'executando', worker = ?, lease_ate = ?,
+                              tentativas = tentativas + 1
+               WHERE id = ?""",
+            (worker_id, agora + lease, job["id"]),
+        )
+        conexao.execute("COMMIT")
+    except Exception:
+        conexao.execute("ROLLBACK")
+        raise
+    return conexao.execute("SELECT * FROM jobs WHERE id = ?", (job["id"],)).fetchone()
+
+def renovar_lease(conexao, job_id, worker_id, lease=LEASE_SEGUNDOS):
+    """Renova o lease do job; retorna False se outro worker já o assumiu"""
+    cursor = conexao.execute(
+        "UPDATE jobs SET lease_ate = ? WHERE id = ? AND worker = ? AND estado = 'executando'",
+        (time.time() + lease, job_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+def concluir_job(conexao, job_id, worker_id, saida_txt, saida_srt):
+    """Marca o job como concluído (somente se este worker ainda for o dono)"""
+    cursor = conexao.execute(
+        """UPDATE jobs SET estado = 'concluido', saida_txt = ?, saida_srt = ?,
+                          concluido_em = ?, lease_ate = NULL, erro = NULL
+           WHERE id = ? AND worker = ? AND estado = 'executando'""",
+        (saida_txt, saida_srt, time.time(), job_id, worker_id),
+    )
+    return cursor.rowcount == 1
+
+def falhar_job(conexao, job_id, worker_id, erro):
+    """Devolve o job para a fila ou marca como falho após MAX_TENTATIVAS"""
+    conexao.execute(
+        """UPDATE jobs SET estado = CASE WHEN tentativas >= ? THEN 'falhou' ELSE 'pendente' END,
+                          erro = ?, lease_ate = NULL
+           WHERE id = ? AND worker = ?""",
+        (MAX_TENTATIVAS, str(erro), job_id, worker_id),
+    )
+
+def resumo_fila(caminho_db):
+    """Retorna a contagem de jobs por estado"""
+    conexao = conectar(caminho_db)
+    linhas = conexao.execute("SELECT estado, COUNT(*) AS total FROM jobs GROUP BY estado").fetchall()
+    conexao.close()
+    return {linha["estado"]: linha["total"] for linha in linhas}
+
+def _heartbeat(caminho_db, job_id, worker_id, lease, parar, lease_perdido):
+    """
+    Renova o lease periodicamente enquanto o job estiver em execução
+
+    Erros do SQLite (ex.: "database is locked" no NFS) são tentados de novo
+    na próxima batida; se o lease vencer sem nenhuma renovação, o job é
+    dado como perdido, pois outro worker pode tê-lo assumido.
+    """
+    ultima_renovacao = time.time()
+    conexao = None
+    try:
+        while not parar.wait(lease / 3):
+            try:
+                if conexao is None:
+                    conexao = conectar(caminho_db)
+                if not renovar_lease(conexao, job_id, worker_id, lease):
+                    lease_perdido.set()
+                    break
+                ultima_renovacao = time.time()
+            except sqlite3.Error as e:
+                print(f"⚠️ [{worker_id}] Falha ao renovar o lease do job {job_id}: {e}")
+                if time.time() - ultima_renovacao >= lease:
+                    lease_perdido.set()
+                    break
+    finally:
+        if conexao is not None:
+            conexao.close()
+
+def executar_worker(caminho_db, worker_id=None, lease=LEASE_SEGUNDOS, retomavel=False, baixa_memoria=False, sair_quando_vazia=True):
+    """
+    Loop do worker: reivindica jobs do ledger e transcreve até a fila esvaziar
+
+    O modelo carregado é reutilizado entre jobs do mesmo modelo. Um thread
+    de heartbeat renova o lease; se o worker morrer, o lease expira e outro
+    worker assume o job (com --checkpoint, a partir do último bloco salvo).
+    Os relógios das máquinas devem estar sincronizados (NTP).
+
+    Returns:
+        int: Quantidade de jobs concluídos por este worker
+    """
+    from main import salvar_transcricao
+    from memoria import carregar_modelo, inferencia_economica
+    from checkpoint import transcrever_com_checkpoint
+    from sondagem import registrar_tempo
+
+    worker_id = worker_id or gerar_id_worker()
+    conexao = conectar(caminho_db)
+    cache_dir = os.path.join(os.getcwd(), "whisper_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+
+    modelo_carregado = (None, None)
+    concluidos = 0
+
+    print(f"👷 Worker {worker_id} iniciado")
+    while True:
+        job = reivindicar_job(conexao, worker_id, lease)
+        if job is None:
+            pendentes = resumo_fila(caminho_db)
+            if sair_quando_vazia and not pendentes.get("pendente") and not pendentes.get("executando"):
+                break
+            time.sleep(INTERVALO_OCIOSO)
+            continue
+
+        print(f"🎤 [{worker_id}] Job {job['id']}: {os.path.basename(job['caminho'])} ({job['modelo']})")
+
+        parar = threading.Event()
+        lease_perdido = threading.Event()
+        batimento = threading.Thread(
+            target=_heartbeat,
+            args=(caminho_db, job["id"], worker_id, lease, parar, lease_perdido),
+            daemon=True,
+        )
+        batimento.start()
+
+        try:
+            if modelo_carregado[0] != job["modelo"]:
+                modelo_carregado = (job["modelo"], carregar_modelo(job["modelo"], cache_dir, baixa_memoria=baixa_memoria))
+            model = modelo_carregado[1]
+
+            opcoes = json.loads(job["opcoes"]) if job["opcoes"] else {}
+            inicio_tempo = time.time()
+            with inferencia_economica():
+                if retomavel:
+                    resultado = transcrever_com_checkpoint(model, job["caminho"], modelo=job["modelo"], idioma=job["idioma"], **opcoes)
+                else:
+                    resultado = model.transcribe(job["caminho"], language=job["idioma"], **opcoes)
+            tempo_total = time.time() - inicio_tempo
+
+            # Confirmar (e renovar) a posse antes de gravar no sistema de arquivos compartilhado
+            if lease_perdido.is_set() or not renovar_lease(conexao, job["id"], worker_id, lease):
+                print(f"⚠️ [{worker_id}] Lease do job {job['id']} foi assumido por outro worker; descartando resultado")
+                continue
+
+            nome_txt, nome_srt = salvar_transcricao(resultado, job["caminho"], job["modelo"], tempo_total)
+            if concluir_job(conexao, job["id"], worker_id, nome_txt, nome_srt):
+                concluidos += 1
+                if job["duracao"]:
+                    registrar_tempo(job["modelo"], job["duracao"], tempo_total)
+                print(f"✅ [{worker_id}] Job {job['id']} concluído em {tempo_total:.1f}s")
+        except Exception as e:
+            print(f"❌ [{worker_id}] Job {job['id']} falhou: {e}")
+            falhar_job(conexao, job["id"], worker_id, e)
+        finally:
+            parar.set()
+            batimento.join()
+
+    conexao.close()
+    print(f"🏁 Worker {worker_id} finalizado: {concluidos} jobs concluídos")
+    return concluidos
+
+def executar_workers_locais(caminho_db, processos, **opcoes):
+    """Inicia vários workers como processos locais (útil para testes em uma máquina)"""
+    workers = [
+        multiprocessing.Process(target=executar_worker, args=(caminho_db,), kwargs=opcoes)
+        for _ in range(processos)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def main():
+    parser = argparse.ArgumentParser(description="Fila distribuída de transcrição (ledger SQLite compartilhado)")
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_enfileirar = subcomandos.add_parser("enfileirar", help="Adiciona arquivos à fila")
+    p_enfileirar.add_argument("db", help="Arquivo SQLite no sistema de arquivos compartilhado")
+    p_enfileirar.add_argument("arquivos", nargs="+", help="Arquivos de áudio")
+    p_enfileirar.add_argument("--modelo", default="base", choices=['tiny', 'base', 'small', 'medium', 'large'])
+    p_enfileirar.add_argument("--idioma", default="pt", help="Código do idioma ('auto' para detectar)")
+    p_enfileirar.add_argument("--perfil", metavar="NOME", help="Perfil de vocabulário em perfis/NOME.json")
+
+    p_worker = subcomandos.add_parser("worker", help="Processa jobs da fila")
+    p_worker.add_argument("db")
+    p_worker.add_argument("--processos", type=int, default=1, help="Quantidade de workers locais")
+    p_worker.add_argument("--lease", type=int, default=LEASE_SEGUNDOS, help="Validade do lease em segundos")
+    p_worker.add_argument("--checkpoint", action="store_true", help="Usa checkpoints para retomar jobs de workers mortos")
+    p_worker.add_argument("--baixa-memoria", action="store_true")
+    p_worker.add_argument("--aguardar", action="store_true", help="Continua aguardando novos jobs quando a fila esvaziar")
+
+    p_status = subcomandos.add_parser("status", help="Mostra o estado da fila")
+    p_status.add_argument("db")
+
+    args = parser.parse_args()
+
+    if args.comando == "enfileirar":
+        from perfis import carregar_perfil, opcoes_perfil
+        try:
+            opcoes = opcoes_perfil(carregar_perfil(args.perfil)) if args.perfil else None
+        except (FileNotFoundError, ValueError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        idioma = None if args.idioma == "auto" else args.idioma
+        total = enfileirar(args.db, args.arquivos, args.modelo, idioma, opcoes)
+        print(f"📥 {total} jobs adicionados à fila")
+    elif args.comando == "worker":
+        opcoes = {
+            "lease": args.lease,
+            "retomavel": args.checkpoint,
+            "baixa_memoria": args.baixa_memoria,
+            "sair_quando_vazia": not args.aguardar,
+        }
+        if args.processos > 1:
+            executar_workers_locais(args.db, args.processos, **opcoes)
+        else:
+            executar_worker(args.db, **opcoes)
+    elif args.comando == "status":
+        for estado, total in sorted(resumo_fila(args.db).items()):
+            print(f"   {estado}: {total}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,216 @@
+import re
+import copy
+import contextlib
+import dataclasses
+from collections import deque
+
+# Tamanho dos n-gramas de palavras comparados entre janelas
+TAMANHO_NGRAMA = 3
+
+# Fração de n-gramas de uma janela já vistos nas janelas recentes para considerá-la repetição
+LIMIAR_REPETICAO = 0.8
+
+# Taxa de compressão a partir da qual a janela é cortada sem tentar outras temperaturas
+# (o Whisper já faz fallback a partir de 2.4; acima disso o texto quase sempre é um loop)
+LIMIAR_COMPRESSAO = 3.0
+
+# Quantidade de janelas recentes usadas como histórico
+JANELAS_HISTORICO = 3
+
+# Segmentos idênticos consecutivos mantidos antes de começar a remover
+REPETICOES_PERMITIDAS = 2
+
+def _normalizar(texto):
+    return re.sub(r"[^\w\s]", "", texto.lower()).split()
+
+def _ngramas(palavras, n):
+    if len(palavras) < n:
+        return {tuple(palavras)} if palavras else set()
+    return {tuple(palavras[i:i + n]) for i in range(len(palavras) - n + 1)}
+
+class GuardaAlucinacao:
+    """
+    Observa as janelas decodificadas pelo Whisper e corta loops de repetição
+
+    Envolve o decode de uma cópia rasa do modelo (mesmos pesos) durante a
+    transcrição, sem alterar a instância compartilhada. Quando uma janela repete
+    os n-gramas das janelas anteriores ou tem taxa de compressão muito
+    alta, o resultado é marcado como silêncio: o transcribe() não tenta
+    outras temperaturas, pula a janela inteira e segue para a próxima.
+    A janela seguinte é decodificada sem o prompt anterior para quebrar
+    o loop. Histórico e prompt são separados por tarefa (transcribe e
+    translate), para a transcrição dupla não misturar os dois textos.
+
+    Uma janela só entra no histórico depois de aceita: as tentativas do
+    fallback de temperatura decodificam o mesmo mel, então a última
+    tentativa fica pendente e é confirmada quando chega um mel diferente.
+    Assim uma nova tentativa nunca é comparada com as anteriores da
+    própria janela.
+    """
+
+    def __init__(self, tamanho_ngrama=TAMANHO_NGRAMA, limiar_repeticao=LIMIAR_REPETICAO, limiar_compressao=LIMIAR_COMPRESSAO):
+        self.tamanho_ngrama = tamanho_ngrama
+        self.limiar_repeticao = limiar_repeticao
+        self.limiar_compressao = limiar_compressao
+        self.historicos = {}
+        self.eventos = []
+        self.decodificacoes = 0
+        self.descartar_prompt = set()
+        # Janela em andamento por tarefa: mel, n-gramas da última tentativa e se roda sem prompt
+        self._janelas = {}
+
+    def _historico(self, tarefa):
+        if tarefa not in self.historicos:
+            self.historicos[tarefa] = deque(maxlen=JANELAS_HISTORICO)
+        return self.historicos[tarefa]
+
+    def motivo_corte(self, texto, taxa_compressao, tarefa="transcribe"):
+        """Retorna o motivo para cortar a janela, ou None se ela parecer normal"""
+        if taxa_compressao > self.limiar_compressao:
+            return f"taxa de compressão {taxa_compressao:.1f}"
+
+        ngramas = _ngramas(_normalizar(texto), self.tamanho_ngrama)
+        historico = self._historico(tarefa)
+        if not ngramas or not historico:
+            return None
+        vistos = set().union(*historico)
+        repetidos = len(ngramas & vistos) / len(ngramas)
+        if repetidos >= self.limiar_repeticao:
+            return f"repetição de {repetidos:.0%} dos n-gramas"
+        return None
+
+    def _confirmar(self, tarefa):
+        """Leva a última tentativa aceita da janela em andamento para o histórico"""
+        janela = self._janelas.pop(tarefa, None)
+        if janela and janela["ngramas"] is not None:
+            self._historico(tarefa).append(janela["ngramas"])
+
+    def confirmar_janelas(self):
+        """Confirma as janelas em andamento (ex.: ao fim de um transcribe)"""
+        for tarefa in list(self._janelas):
+            self._confirmar(tarefa)
+
+    def estado(self):
+        """Estado entre janelas (históricos e prompts a descartar), serializável em JSON"""
+        self.confirmar_janelas()
+        return {
+            "historicos": {
+                tarefa: [sorted(list(ngrama) for ngrama in ngramas) for ngramas in historico]
+                for tarefa, historico in self.historicos.items()
+            },
+            "descartar_prompt": sorted(self.descartar_prompt),
+            "eventos": self.eventos,
+            "decodificacoes": self.decodificacoes,
+        }
+
+    def restaurar(self, estado):
+        """Retoma o estado salvo por estado() (ex.: ao continuar de um checkpoint)"""
+        self.historicos = {}
+        self._janelas = {}
+        for tarefa, historico in estado.get("historicos", {}).items():
+            self._historico(tarefa).extend({tuple(ngrama) for ngrama in ngramas} for ngramas in historico)
+        self.descartar_prompt = set(estado.get("descartar_prompt", []))
+        self.eventos = list(estado.get("eventos", []))
+        self.decodificacoes = estado.get("decodificacoes", 0)
+
+    def envolver(self, decode):
+        """Cria o substituto de model.decode que aplica a guarda"""
+        def decode_com_guarda(mel, options, **kwargs):
+            tarefa = options.task
+            janela = self._janelas.get(tarefa)
+            if janela is None or janela["mel"] is not mel:
+                # Mel novo: o Whisper aceitou a última tentativa da janela anterior
+                self._confirmar(tarefa)
+                janela = self._janelas[tarefa] = {
+                    "mel": mel,
+                    "ngramas": None,
+                    "sem_prompt": tarefa in self.descartar_prompt,
+                }
+                self.descartar_prompt.discard(tarefa)
+            if janela["sem_prompt"]:
+                options = dataclasses.replace(options, prompt=None)
+
+            resultado = decode(mel, options, **kwargs)
+            # Com features em lote (ex.: transcrever_e_traduzir) o decode devolve uma lista
+            if isinstance(resultado, list):
+                return [self._verificar(r, tarefa, janela) for r in resultado]
+            return self._verificar(resultado, tarefa, janela)
+        return decode_com_guarda
+
+    def _verificar(self, resultado, tarefa, janela):
+        """Guarda a tentativa como pendente da janela ou a marca como silêncio se for um loop"""
+        self.decodificacoes += 1
+
+        motivo = self.motivo_corte(resultado.text, resultado.compression_ratio, tarefa)
+        if motivo:
+            self.eventos.append({
+                "decodificacao": self.decodificacoes,
+                "tarefa": tarefa,
+                "motivo": motivo,
+                "texto": resultado.text.strip()[:120],
+            })
+            self.descartar_prompt.add(tarefa)
+            janela["ngramas"] = None
+            # no_speech_prob alto + logprob mínimo fazem o transcribe pular a janela
+            return dataclasses.replace(resultado, no_speech_prob=1.0, avg_logprob=float("-inf"))
+
+        # Substitui a tentativa anterior da mesma janela; entra no histórico ao ser confirmada
+        janela["ngramas"] = _ngramas(_normalizar(resultado.text), self.tamanho_ngrama)
+        return resultado
+
+    def filtrar_segmentos(self, resultado):
+        """
+        Remove segmentos idênticos consecutivos que sobraram e registra os metadados
+
+        Args:
+            resultado (dict): Resultado de model.transcribe (alterado no lugar)
+
+        Returns:
+            dict: O mesmo resultado, com a chave extra "guarda"
+        """
+        segmentos = []
+        removidos = []
+        repeticoes = 0
+        for segmento in resultado["segments"]:
+            if segmentos and _normalizar(segmento["text"]) == _normalizar(segmentos[-1]["text"]):
+                repeticoes += 1
+                if repeticoes >= REPETICOES_PERMITIDAS:
+                    removidos.append((segmento["start"], segmento["end"]))
+                    continue
+            else:
+                repeticoes = 0
+            segmentos.append(segmento)
+
+        for i, segmento in enumerate(segmentos):
+            segmento["id"] = i
+
+        resultado["segments"] = segmentos
+        resultado["text"] = "".join(s["text"] for s in segmentos)
+        resultado["guarda"] = {
+            "janelas_cortadas": len(self.eventos),
+            "eventos": self.eventos,
+            "segmentos_removidos": removidos,
+        }
+        return resultado
+
+@contextlib.contextmanager
+def guarda_alucinacao(model, **config):
+    """
+    Ativa a guarda de alucinação durante o bloco with
+
+    O modelo recebido não é alterado (ele pode estar compartilhado entre
+    sessões do Streamlit): a transcrição deve usar guarda.modelo, uma cópia
+    rasa que compartilha os pesos e tem o decode envolvido.
+
+    Exemplo:
+        with guarda_alucinacao(model) as guarda:
+            resultado = guarda.filtrar_segmentos(guarda.modelo.transcribe(audio))
+    """
+    guarda = GuardaAlucinacao(**config)
+    guarda.modelo = copy.copy(model)
+    guarda.modelo.decode = guarda.envolver(type(model).decode.__get__(model))
+    try:
+        yield guarda
+    finally:
+        guarda.confirmar_janelas()
+        guarda.modelo = None
@@ -0,0 +1,128 @@
+import os
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import torch
+import whisper
+from espectrograma import ativar_cache_mel, calcular_mel, escopo_cache_mel, limpar_cache_mel
+from guarda import guarda_alucinacao
+from memoria import inferencia_economica
+from traducao import transcrever_e_traduzir
+
+# Núcleos usados por padrão no lote (decodificação ffmpeg + log-mel e threads do torch na inferência)
+NUCLEOS_PADRAO = max(1, min(4, (os.cpu_count() or 1) - 1))
+
+# Um modelo carregado é compartilhado entre jobs e sessões; os hooks de kv-cache
+# do Whisper não são seguros entre threads, então a inferência é serializada
+trava_modelo = threading.Lock()
+
+def ordenar_por_duracao(itens):
+    """
+    Ordena os itens do lote do mais curto para o mais longo
+
+    Processar os menores primeiro minimiza a latência média: cada arquivo
+    curto fica pronto sem esperar pelos longos. Itens sem duração
+    conhecida vão para o final.
+
+    Args:
+        itens (list): Dicts com a chave "duracao" (segundos ou None)
+
+    Returns:
+        list: Novos itens ordenados
+    """
+    return sorted(itens, key=lambda item: (item.get("duracao") is None, item.get("duracao") or 0))
+
+def preparar_audio(caminho_audio, n_mels=80, dono=None):
+    """
+    Decodifica o áudio e calcula o log-mel, deixando-o no cache em nome de `dono`
+
+    Roda fora da trava do modelo: o ffmpeg é um subprocesso e o STFT do
+    torch libera o GIL, então vários arquivos podem ser preparados em
+    paralelo enquanto outro é transcrito.
+
+    Returns:
+        np.ndarray: Amostras do áudio (16 kHz, mono)
+    """
+    amostras = whisper.load_audio(caminho_audio)
+    calcular_mel(amostras, n_mels, dono=dono)
+    return amostras
+
+def executar_lote(model, caminhos, idioma=None, nucleos=NUCLEOS_PADRAO, guarda=None, traduzir=False, **opcoes):
+    """
+    Transcreve vários arquivos com um único modelo carregado
+
+    A preparação (ffmpeg + log-mel) roda em até `nucleos` threads, com no
+    máximo `nucleos` arquivos adiantados na memória; a inferência segue
+    a ordem recebida, um arquivo por vez, sob `trava_modelo` e com o torch
+    limitado a `nucleos` threads. O log-mel de cada arquivo sai do cache
+    assim que ele é transcrito.
+
+    Args:
+        model: Modelo Whisper já carregado
+        caminhos (list): Caminhos dos áudios, já na ordem de execução
+        idioma (str): Código do idioma ou None para detectar
+        nucleos (int): Orçamento de threads para a preparação e a inferência
+        guarda (dict): Configuração da guarda de alucinação (None desativa)
+        traduzir (bool): Gera também a tradução para o inglês (chave "traducao")
+        **opcoes: Repassadas para model.transcribe (ou transcrever_e_traduzir)
+
+    Yields:
+        tuple: (índice, estado, dados) com estado "transcrevendo" (dados None),
+            "concluido" (dados = resultado, com "tempo_inferencia") ou "erro" (dados = exceção)
+    """
+    ativar_cache_mel()
+    nucleos = max(1, nucleos)
+
+    # Cada arquivo é dono da própria entrada no cache de log-mel
+    lote_id = uuid.uuid4().hex[:8]
+    def dono(indice):
+        return f"lote-{lote_id}-{indice}"
+
+    def transcrever(modelo, amostras):
+        if traduzir:
+            return transcrever_e_traduzir(modelo, amostras, idioma, **opcoes)
+        return modelo.transcribe(amostras, language=idioma, **opcoes)
+
+    with ThreadPoolExecutor(max_workers=nucleos) as executor:
+        pendentes = {}
+        proximo = 0
+        try:
+            for indice, caminho in enumerate(caminhos):
+                # Manter até `nucleos` arquivos sendo preparados à frente do atual
+                while proximo < len(caminhos) and proximo < indice + nucleos + 1:
+                    pendentes[proximo] = executor.submit(preparar_audio, caminhos[proximo], model.dims.n_mels, dono(proximo))
+                    proximo += 1
+
+                try:
+                    amostras = pendentes.pop(indice).result()
+                    yield indice, "transcrevendo", None
+                    with trava_modelo, inferencia_economica(), escopo_cache_mel(dono(indice)):
+                        # O número de threads do torch é global: ajustar só enquanto a trava estiver conosco
+                        threads_anteriores = torch.get_num_threads()
+                        torch.set_num_threads(nucleos)
+                        try:
+                            inicio = time.time()
+                            if guarda is not None:
+                                with guarda_alucinacao(model, **guarda) as protecao:
+                                    resultado = protecao.filtrar_segmentos(transcrever(protecao.modelo, amostras))
+                            else:
+                                resultado = transcrever(model, amostras)
+                            resultado["tempo_inferencia"] = time.time() - inicio
+                        finally:
+                            torch.set_num_threads(threads_anteriores)
+                    del amostras
+                except Exception as e:
+                    yield indice, "erro", e
+                    continue
+                finally:
+                    limpar_cache_mel(dono(indice))
+
+                yield indice, "concluido", resultado
+        finally:
+            # Lote interrompido: descartar o que foi adiantado e não chegou a ser transcrito
+            for futuro in pendentes.values():
+                futuro.cancel()
+            executor.shutdown(wait=True)
+            for indice in pendentes:
+                limpar_cache_mel(dono(indice))
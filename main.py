@@ -1,10 +1,23 @@
-import whisper
 import os
 import subprocess
 import sys
 import time
 import glob
+import argparse
+import contextlib
+import gc
 from datetime import datetime, timedelta
+from checkpoint import transcrever_com_checkpoint
+from memoria import escolher_modelo_por_memoria, exigir_memoria, carregar_modelo, inferencia_economica
+from cascata import transcrever_em_cascata
+from espectrograma import ativar_cache_mel, escopo_cache_mel, limpar_cache_mel, bandas_mel, LIMITE_CACHE_MB, LIMITE_CACHE_BAIXA_MEMORIA_MB
+from guarda import guarda_alucinacao, LIMIAR_REPETICAO, LIMIAR_COMPRESSAO
+from sondagem import sondar_audio, avaliar_job, registrar_tempo, formatar_duracao
+from traducao import transcrever_e_traduzir
+from perfis import carregar_perfil, opcoes_perfil, listar_perfis
+
+# Dono das entradas do cache de log-mel criadas pela linha de comando
+DONO_CACHE_MEL = "cli"
 
 def verificar_ffmpeg():
     """Verifica se o ffmpeg está disponível no sistema"""
@@ -132,7 +145,38 @@ def gerar_srt(resultado, nome_arquivo):
     
     return nome_srt
 
-def transcrever_audio(caminho_audio, modelo="base", idioma="pt"):
+def salvar_transcricao(resultado, arquivo_audio, modelo, tempo_total, sufixo=""):
+    """
+    Salva a transcrição em TXT e as legendas em SRT ao lado do áudio
+    
+    Args:
+        resultado (dict): Resultado da transcrição do Whisper
+        arquivo_audio (str): Caminho do arquivo de áudio transcrito
+        modelo (str): Modelo usado (se o resultado não informar outro)
+        tempo_total (float): Tempo de processamento em segundos
+        sufixo (str): Sufixo do nome dos arquivos (ex.: "_en" para a tradução)
+    
+    Returns:
+        tuple: Caminhos dos arquivos TXT e SRT gerados
+    """
+    nome_base = os.path.splitext(arquivo_audio)[0] + sufixo
+    nome_txt = f"{nome_base}_transcricao.txt"
+    
+    # Salvar arquivo TXT
+    with open(nome_txt, "w", encoding="utf-8") as f:
+        f.write(f"Transcrição de: {os.path.basename(arquivo_audio)}\n")
+        f.write(f"Modelo usado: {resultado.get('modelo', modelo).upper()}\n")
+        f.write(f"Idioma detectado: {resultado.get('language', 'N/A')}\n")
+        f.write(f"Tempo de processamento: {tempo_total:.1f}s\n")
+        f.write("-" * 50 + "\n\n")
+        f.write(resultado["text"])
+    
+    # Salvar arquivo SRT (legendas)
+    nome_srt = gerar_srt(resultado, f"{nome_base}_legendas")
+    
+    return nome_txt, nome_srt
+
+def transcrever_audio(caminho_audio, modelo="base", idioma="pt", retomavel=False, baixa_memoria=False, modelo_cascata=None, guarda=None, traduzir=False, opcoes=None):
     """
     Transcreve um arquivo de áudio usando o Whisper
     
@@ -140,16 +184,30 @@ def transcrever_audio(caminho_audio, modelo="base", idioma="pt"):
         caminho_audio (str): Caminho para o arquivo de áudio
         modelo (str): Modelo do Whisper a usar (tiny, base, small, medium, large)
         idioma (str): Código do idioma (pt para português, en para inglês, etc.)
+        retomavel (bool): Grava checkpoints em disco e retoma execuções interrompidas
+        baixa_memoria (bool): Verifica a RAM livre, mapeia os pesos do disco (mmap) e rebaixa o modelo se necessário
+        modelo_cascata (str): Modelo maior usado para re-transcrever só os segmentos de baixa confiança
+        guarda (dict): Configuração da guarda contra repetições/alucinações (None desativa)
+        traduzir (bool): Gera também a tradução para o inglês, reaproveitando o encoder de cada janela
+        opcoes (dict): Opções de decodificação (initial_prompt, beam_size...) de um perfil de vocabulário
     
     Returns:
-        dict: Resultado da transcrição
+        dict: Resultado da transcrição (com a chave "traducao" se traduzir=True e
+            "tempo_inferencia" com os segundos gastos só na transcrição)
     """
     
+    opcoes = opcoes or {}
+    
     # Configurar ffmpeg local se disponível
     bin_dir = os.path.join(os.getcwd(), "bin")
     if os.path.exists(bin_dir):
         os.environ["PATH"] = f"{bin_dir}:{os.environ.get('PATH', '')}"
     
+    if baixa_memoria:
+        modelo, aviso = escolher_modelo_por_memoria(modelo, baixa_memoria=True)
+        if aviso:
+            print(f"⚠️  {aviso}")
+    
     print(f"🤖 Carregando modelo Whisper '{modelo.upper()}'...")
     
     # Definir cache local para evitar problemas de permissão
@@ -157,22 +215,89 @@ def transcrever_audio(caminho_audio, modelo="base", idioma="pt"):
     os.makedirs(cache_dir, exist_ok=True)
     os.environ["WHISPER_CACHE_DIR"] = cache_dir
     
+    # Na cascata o mesmo áudio passa por dois modelos: reaproveitar o log-mel entre eles se
+    # usarem as mesmas bandas (fora dela, e nos blocos do checkpoint, nada seria reutilizado)
+    reaproveitar_mel = modelo_cascata and not traduzir and bandas_mel(modelo) == bandas_mel(modelo_cascata)
+    if reaproveitar_mel:
+        ativar_cache_mel(LIMITE_CACHE_BAIXA_MEMORIA_MB if baixa_memoria else LIMITE_CACHE_MB)
+    
     try:
-        model = whisper.load_model(modelo, download_root=cache_dir)
+        model = carregar_modelo(modelo, cache_dir, baixa_memoria=baixa_memoria)
         print(f"✅ Modelo '{modelo.upper()}' carregado com sucesso!")
         
         print(f"🎤 Transcrevendo arquivo: {os.path.basename(caminho_audio)}")
-        resultado = model.transcribe(caminho_audio, language=idioma)
+        inicio_inferencia = time.time()
+        with inferencia_economica(), contextlib.ExitStack() as pilha:
+            if reaproveitar_mel:
+                pilha.enter_context(escopo_cache_mel(DONO_CACHE_MEL))
+            protecao = pilha.enter_context(guarda_alucinacao(model, **guarda)) if guarda is not None else None
+            # A guarda envolve uma cópia rasa do modelo (mesmos pesos)
+            model_ativo = protecao.modelo if protecao else model
+            if traduzir:
+                # Transcrição + tradução com uma única passada do encoder por janela
+                resultado = transcrever_e_traduzir(model_ativo, caminho_audio, idioma, **opcoes)
+            elif modelo_cascata:
+                # O modelo rápido já está carregado; o preciso só é carregado se houver trechos incertos
+                def carregar(nome):
+                    nonlocal model, model_ativo
+                    if nome == modelo:
+                        return model_ativo
+                    if baixa_memoria:
+                        # A primeira passada terminou: liberar o modelo rápido antes de checar a folga
+                        model = model_ativo = None
+                        if protecao:
+                            protecao.modelo = None
+                        gc.collect()
+                        exigir_memoria(nome, baixa_memoria=True)
+                    print(f"🤖 Carregando modelo Whisper '{nome.upper()}'...")
+                    return carregar_modelo(nome, cache_dir, baixa_memoria=baixa_memoria)
+                resultado = transcrever_em_cascata(carregar, caminho_audio, modelo, modelo_cascata, idioma, **opcoes)
+            elif retomavel:
+                resultado = transcrever_com_checkpoint(model_ativo, caminho_audio, modelo=modelo, idioma=idioma,
+                                                       guarda=protecao, **opcoes)
+            else:
+                resultado = model_ativo.transcribe(caminho_audio, language=idioma, **opcoes)
+            
+            if protecao:
+                protecao.filtrar_segmentos(resultado)
         
+        # Só a inferência (sem carregar o modelo) alimenta o histórico de fator de tempo real
+        resultado["tempo_inferencia"] = time.time() - inicio_inferencia
+        resultado.setdefault("modelo", modelo)
         return resultado
         
     except Exception as e:
         print(f"❌ Erro ao carregar modelo ou transcrever: {e}")
         raise
+    finally:
+        limpar_cache_mel(DONO_CACHE_MEL)
     
     return resultado
 
+def ler_argumentos():
+    """Lê os argumentos opcionais da linha de comando"""
+    parser = argparse.ArgumentParser(description="Transcritor de Áudio com Whisper")
+    parser.add_argument("arquivo", nargs="?", help="Arquivo de áudio (se omitido, será solicitado)")
+    parser.add_argument("--modelo", choices=['tiny', 'base', 'small', 'medium', 'large'], help="Modelo Whisper a usar")
+    parser.add_argument("--checkpoint", action="store_true", help="Salva checkpoints e retoma transcrições interrompidas")
+    parser.add_argument("--baixa-memoria", action="store_true", help="Modo para máquinas com pouca RAM (mmap dos pesos + verificação de memória)")
+    parser.add_argument("--sem-guarda", action="store_true", help="Desativa a guarda contra repetições/alucinações")
+    parser.add_argument("--guarda-repeticao", type=float, default=LIMIAR_REPETICAO, metavar="FRACAO",
+                        help=f"Fração de n-gramas repetidos que corta uma janela (padrão: {LIMIAR_REPETICAO})")
+    parser.add_argument("--guarda-compressao", type=float, default=LIMIAR_COMPRESSAO, metavar="TAXA",
+                        help=f"Taxa de compressão que corta uma janela (padrão: {LIMIAR_COMPRESSAO})")
+    parser.add_argument("--cascata", choices=['small', 'medium', 'large'], metavar="MODELO_PRECISO",
+                        help="Transcreve com --modelo e re-transcreve os trechos de baixa confiança com este modelo maior")
+    parser.add_argument("--tempo-maximo", type=float, metavar="SEGUNDOS",
+                        help="Tempo de processamento desejado; se a estimativa passar disso, usa um modelo mais rápido")
+    parser.add_argument("--perfil", metavar="NOME",
+                        help=f"Perfil de vocabulário em perfis/NOME.json (disponíveis: {', '.join(listar_perfis()) or 'nenhum'})")
+    parser.add_argument("--traducao", action="store_true",
+                        help="Gera também TXT/SRT em inglês (sufixo _en) na mesma passada do encoder")
+    return parser.parse_args()
+
 def main():
+    args = ler_argumentos()
     print("=== Transcritor de Áudio com Whisper ===\n")
     
     # Executar limpeza automática de 24h
@@ -196,11 +321,13 @@ def main():
             return
     
     # Solicitar arquivo de áudio
-    print("📁 Selecione o arquivo de áudio para transcrição:")
-    print("   • Formatos suportados: MP3, WAV, M4A, FLAC, OGG, WMA")
-    print("   • Coloque o arquivo na pasta do projeto ou use caminho completo\n")
-    
-    arquivo_audio = input("📂 Digite o nome/caminho do arquivo de áudio: ").strip()
+    arquivo_audio = args.arquivo
+    if not arquivo_audio:
+        print("📁 Selecione o arquivo de áudio para transcrição:")
+        print("   • Formatos suportados: MP3, WAV, M4A, FLAC, OGG, WMA")
+        print("   • Coloque o arquivo na pasta do projeto ou use caminho completo\n")
+        
+        arquivo_audio = input("📂 Digite o nome/caminho do arquivo de áudio: ").strip()
     
     if not arquivo_audio:
         print("❌ Nenhum arquivo especificado.")
@@ -224,31 +351,90 @@ def main():
         print(f"\n📊 Arquivo selecionado: {os.path.basename(arquivo_audio)}")
         print(f"📏 Tamanho: {tamanho_mb:.1f} MB")
         
-        # Escolher modelo
-        print("\n🤖 Escolha o modelo Whisper:")
-        print("   • tiny   - Rápido, precisão básica (~39MB)")
-        print("   • base   - Balanceado, recomendado (~74MB)")
-        print("   • small  - Boa precisão (~244MB)")
-        print("   • medium - Excelente para áudio complexo (~769MB)")
-        print("   • large  - Máxima precisão (~1550MB)")
+        # Sondar duração e codec sem decodificar o áudio
+        info_audio = None
+        try:
+            info_audio = sondar_audio(arquivo_audio)
+            print(f"⏱️  Duração: {formatar_duracao(info_audio['duracao'])} "
+                  f"({info_audio['codec']}, {info_audio['sample_rate']} Hz, {info_audio['canais']} canal(is))")
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+        except RuntimeError as e:
+            print(f"⚠️  Não foi possível sondar o áudio: {e}")
         
-        modelo = input("\n🎯 Digite o modelo [base]: ").strip().lower() or "base"
+        # Escolher modelo
+        modelo = args.modelo
+        if not modelo:
+            print("\n🤖 Escolha o modelo Whisper:")
+            print("   • tiny   - Rápido, precisão básica (~39MB)")
+            print("   • base   - Balanceado, recomendado (~74MB)")
+            print("   • small  - Boa precisão (~244MB)")
+            print("   • medium - Excelente para áudio complexo (~769MB)")
+            print("   • large  - Máxima precisão (~1550MB)")
+            
+            modelo = input("\n🎯 Digite o modelo [base]: ").strip().lower() or "base"
         
         if modelo not in ['tiny', 'base', 'small', 'medium', 'large']:
             print(f"⚠️  Modelo '{modelo}' inválido. Usando 'base'.")
             modelo = "base"
         
+        # Perfil de vocabulário (prompt inicial, tokens suprimidos, beam size, temperaturas)
+        perfil = None
+        if args.perfil:
+            try:
+                perfil = carregar_perfil(args.perfil)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"❌ {e}")
+                return
+            print(f"📚 Perfil de vocabulário: {perfil['nome']}" + (f" - {perfil['descricao']}" if perfil.get("descricao") else ""))
+        
+        # Admitir o job com base na duração e estimar o tempo de processamento
+        if info_audio:
+            avaliacao = avaliar_job(info_audio, modelo, tempo_maximo=args.tempo_maximo)
+            if not avaliacao["aceito"]:
+                print(f"❌ {avaliacao['motivo']}")
+                return
+            # Roteamento: com --tempo-maximo, um modelo mais rápido pode ser escolhido
+            if avaliacao["motivo"]:
+                print(f"⚠️  {avaliacao['motivo']}")
+            modelo = avaliacao["modelo"]
+        
         print(f"\n🚀 Iniciando transcrição com modelo '{modelo.upper()}'...")
-        print("⏳ Isso pode levar alguns minutos dependendo do tamanho do arquivo...\n")
+        if args.traducao and (args.cascata or args.checkpoint):
+            print("⚠️  --traducao não é combinada com --cascata/--checkpoint; usando apenas a transcrição dupla")
+        if info_audio:
+            print(f"⏳ Tempo estimado: ~{formatar_duracao(avaliacao['estimativa'])}\n")
+        else:
+            print("⏳ Isso pode levar alguns minutos dependendo do tamanho do arquivo...\n")
         
         # Transcrever
         import time
         inicio_tempo = time.time()
-        resultado = transcrever_audio(arquivo_audio, modelo=modelo)
+        guarda = None if args.sem_guarda else {
+            "limiar_repeticao": args.guarda_repeticao,
+            "limiar_compressao": args.guarda_compressao,
+        }
+        resultado = transcrever_audio(arquivo_audio, modelo=modelo, retomavel=args.checkpoint,
+                                      baixa_memoria=args.baixa_memoria, modelo_cascata=args.cascata,
+                                      guarda=guarda, traduzir=args.traducao, opcoes=opcoes_perfil(perfil))
         tempo_total = time.time() - inicio_tempo
+        tempo_inferencia = resultado.pop("tempo_inferencia", tempo_total)
+        
+        # Alimentar o histórico de fatores de tempo real para estimativas futuras
+        if info_audio and "cascata" not in resultado and "traducao" not in resultado:
+            registrar_tempo(resultado.get("modelo", modelo), info_audio["duracao"], tempo_inferencia)
         
         # Mostrar resultados
         print(f"\n🎉 Transcrição concluída em {tempo_total:.1f} segundos!")
+        if "cascata" in resultado:
+            cascata = resultado["cascata"]
+            print(f"🪜 Cascata: {cascata['segmentos_incertos']} segmentos incertos refeitos com "
+                  f"'{cascata['modelo_preciso'].upper()}' em {len(cascata['intervalos'])} trechos")
+        if resultado.get("guarda", {}).get("janelas_cortadas") or resultado.get("guarda", {}).get("segmentos_removidos"):
+            protecao = resultado["guarda"]
+            print(f"🛡️ Guarda: {protecao['janelas_cortadas']} janelas cortadas, "
+                  f"{len(protecao['segmentos_removidos'])} segmentos repetidos removidos")
         print("\n" + "="*60)
         print("📝 TRANSCRIÇÃO COMPLETA:")
         print("="*60)
@@ -265,28 +451,21 @@ def main():
             print(f"{i:2d}. [{inicio//60:02d}:{inicio%60:02d} - {fim//60:02d}:{fim%60:02d}] {texto}")
         
         # Salvar transcrições em arquivos TXT e SRT
-        nome_base = os.path.splitext(arquivo_audio)[0]
-        nome_txt = f"{nome_base}_transcricao.txt"
-        
-        # Salvar arquivo TXT
-        with open(nome_txt, "w", encoding="utf-8") as f:
-            f.write(f"Transcrição de: {os.path.basename(arquivo_audio)}\n")
-            f.write(f"Modelo usado: {modelo.upper()}\n")
-            f.write(f"Idioma detectado: {resultado.get('language', 'N/A')}\n")
-            f.write(f"Tempo de processamento: {tempo_total:.1f}s\n")
-            f.write("-" * 50 + "\n\n")
-            f.write(resultado["text"])
-        
-        # Salvar arquivo SRT (legendas)
-        nome_srt = gerar_srt(resultado, f"{nome_base}_legendas")
+        nome_txt, nome_srt = salvar_transcricao(resultado, arquivo_audio, modelo, tempo_total)
         
         print(f"\n✅ Arquivos salvos:")
         print(f"   📄 Transcrição TXT: {nome_txt}")
         print(f"   🎬 Legendas SRT: {nome_srt}")
+        if "traducao" in resultado:
+            nome_txt_en, nome_srt_en = salvar_transcricao(resultado["traducao"], arquivo_audio, modelo, tempo_total, sufixo="_en")
+            print(f"   🌍 Tradução TXT: {nome_txt_en}")
+            print(f"   🌍 Legendas SRT (inglês): {nome_srt_en}")
         print(f"📊 Estatísticas: {len(resultado['segments'])} segmentos, {len(resultado['text'].split())} palavras")
         
     except KeyboardInterrupt:
         print("\n⚠️ Processo interrompido pelo usuário.")
+        if args.checkpoint:
+            print("💾 Execute novamente com --checkpoint para retomar do último ponto salvo.")
     except Exception as e:
         print(f"\n❌ Erro durante a transcrição: {e}")
         print("💡 Dicas:")
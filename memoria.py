@@ -0,0 +1,151 @@
+import gc
+import contextlib
+import psutil
+import torch
+import whisper
+
+# Ordem dos modelos do mais leve para o mais pesado
+MODELOS_ORDEM = ["tiny", "base", "small", "medium", "large"]
+
+# Estimativa de memória por modelo em MB: (pesos em fp16, como no checkpoint; ativações/buffers de inferência)
+MEMORIA_MODELOS_MB = {
+    "tiny": (75, 300),
+    "base": (145, 400),
+    "small": (485, 700),
+    "medium": (1530, 1200),
+    "large": (3090, 2000),
+}
+
+# Folga mínima que deve sobrar para o sistema e o servidor Streamlit (MB)
+FOLGA_MINIMA_MB = 512
+
+def memoria_necessaria_mb(modelo, baixa_memoria=False):
+    """
+    Estima a memória RAM necessária para carregar e usar um modelo
+
+    No carregamento normal o checkpoint fp16 é lido inteiro para a RAM e
+    depois copiado para os parâmetros fp32 do modelo (≈ 3x os pesos fp16 no
+    pico). No modo de baixa memória os pesos fp16 são mapeados do disco
+    (mmap), então apenas parte deles fica residente ao mesmo tempo.
+
+    Args:
+        modelo (str): Nome do modelo Whisper
+        baixa_memoria (bool): Se o modo de baixa memória será usado
+
+    Returns:
+        int: Memória estimada em MB
+    """
+    pesos, ativacoes = MEMORIA_MODELOS_MB[modelo]
+    if baixa_memoria:
+        return pesos // 2 + ativacoes
+    return pesos * 3 + ativacoes
+
+def memoria_disponivel_mb():
+    """Retorna a memória RAM disponível no momento (MB)"""
+    return psutil.virtual_memory().available / (1024 * 1024)
+
+def escolher_modelo_por_memoria(modelo, baixa_memoria=False):
+    """
+    Verifica se há memória para o modelo escolhido e rebaixa se necessário
+
+    Args:
+        modelo (str): Modelo desejado
+        baixa_memoria (bool): Se o modo de baixa memória será usado
+
+    Returns:
+        tuple: (modelo a usar, mensagem de aviso ou None)
+
+    Raises:
+        MemoryError: Se nem o menor modelo cabe na memória disponível
+    """
+    disponivel = memoria_disponivel_mb() - FOLGA_MINIMA_MB
+
+    candidatos = MODELOS_ORDEM[:MODELOS_ORDEM.index(modelo) + 1]
+    for candidato in reversed(candidatos):
+        if memoria_necessaria_mb(candidato, baixa_memoria) <= disponivel:
+            if candidato == modelo:
+                return modelo, None
+            aviso = (f"Memória insuficiente para '{modelo}' "
+                     f"({memoria_necessaria_mb(modelo, baixa_memoria)} MB necessários, "
+                     f"{max(disponivel, 0):.0f} MB livres). Usando '{candidato}'.")
+            return candidato, aviso
+
+    raise MemoryError(f"Memória insuficiente: apenas {max(disponivel, 0):.0f} MB livres "
+                      f"para carregar qualquer modelo Whisper")
+
+def exigir_memoria(modelo, baixa_memoria=False):
+    """
+    Recusa carregar um modelo que não cabe na memória disponível, sem rebaixá-lo
+
+    Usado quando trocar de modelo não faz sentido (ex.: o modelo preciso
+    da cascata, que só vale a pena se for o escolhido).
+
+    Raises:
+        MemoryError: Se o modelo não cabe na memória disponível
+    """
+    disponivel = memoria_disponivel_mb() - FOLGA_MINIMA_MB
+    necessaria = memoria_necessaria_mb(modelo, baixa_memoria)
+    if necessaria > disponivel:
+        raise MemoryError(f"Memória insuficiente para '{modelo}' "
+                          f"({necessaria} MB necessários, {max(disponivel, 0):.0f} MB livres)")
+
+def carregar_modelo(modelo, download_root, baixa_memoria=False):
+    """
+    Carrega um modelo Whisper, opcionalmente com os pesos mapeados em memória
+
+    No modo de baixa memória o checkpoint é aberto com torch.load(mmap=True)
+    e os tensores são atribuídos diretamente ao modelo (assign=True), sem
+    cópia intermediária; os pesos continuam em fp16 (Linear/Conv1d do
+    Whisper convertem para o tipo da entrada a cada chamada) e só as
+    LayerNorm, pequenas, passam para fp32. Se a versão do torch não
+    suportar mmap, cai no carregamento normal.
+
+    Args:
+        modelo (str): Nome do modelo Whisper
+        download_root (str): Diretório de cache dos modelos
+        baixa_memoria (bool): Se deve usar mmap para os pesos
+
+    Returns:
+        whisper.model.Whisper: Modelo carregado na CPU
+    """
+    if not baixa_memoria:
+        return whisper.load_model(modelo, download_root=download_root)
+
+    caminho = whisper._download(whisper._MODELS[modelo], download_root, False)
+
+    try:
+        checkpoint = torch.load(caminho, map_location="cpu", mmap=True, weights_only=True)
+    except (TypeError, RuntimeError) as e:
+        # torch < 2.1 ou checkpoint em formato antigo: sem suporte a mmap
+        print(f"⚠️ mmap indisponível ({e}), carregando modelo normalmente")
+        return whisper.load_model(modelo, download_root=download_root)
+
+    dims = whisper.model.ModelDimensions(**checkpoint["dims"])
+    model = whisper.model.Whisper(dims)
+    model.load_state_dict(checkpoint["model_state_dict"], assign=True)
+    # A LayerNorm do Whisper recebe a entrada em fp32 e o torch não aceita pesos fp16 nela na CPU
+    for modulo in model.modules():
+        if isinstance(modulo, torch.nn.LayerNorm):
+            modulo.float()
+    model.set_alignment_heads(whisper._ALIGNMENT_HEADS[modelo])
+    del checkpoint
+    gc.collect()
+
+    return model.eval()
+
+@contextlib.contextmanager
+def inferencia_economica():
+    """
+    Executa a inferência em torch.inference_mode e coleta o lixo ao sair
+
+    O Whisper já decodifica sob no_grad; inference_mode apenas dispensa
+    também o controle de versões dos tensores. Ao sair, a coleta de lixo
+    (e o esvaziamento do cache da GPU) devolve a memória do job ao sistema.
+    """
+    try:
+        with torch.inference_mode():
+            yield
+    finally:
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
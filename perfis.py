@@ -0,0 +1,98 @@
+import os
+import json
+import hashlib
+
+# Diretório com os perfis de vocabulário (um arquivo .json por perfil)
+PERFIS_DIR = os.path.join(os.getcwd(), "perfis")
+
+# Opções de decodificação que um perfil pode definir (repassadas para model.transcribe)
+OPCOES_PERFIL = ("initial_prompt", "suppress_tokens", "beam_size", "temperature")
+
+def listar_perfis(diretorio=PERFIS_DIR):
+    """Retorna os nomes dos perfis disponíveis, em ordem alfabética"""
+    if not os.path.isdir(diretorio):
+        return []
+    return sorted(os.path.splitext(nome)[0] for nome in os.listdir(diretorio) if nome.endswith(".json"))
+
+def carregar_perfil(nome, diretorio=PERFIS_DIR):
+    """
+    Lê e valida um perfil de vocabulário
+
+    Exemplo de perfis/produtos.json:
+        {
+            "descricao": "Reuniões de produto",
+            "initial_prompt": "Acme Cloud, Kubernetes, onboarding, SLA.",
+            "suppress_tokens": "-1",
+            "beam_size": 5,
+            "temperature": [0.0, 0.2, 0.4]
+        }
+
+    Args:
+        nome (str): Nome do perfil (arquivo sem a extensão .json)
+        diretorio (str): Diretório dos perfis
+
+    Returns:
+        dict: Perfil com a chave extra "nome"
+
+    Raises:
+        FileNotFoundError: Se o perfil não existir
+        ValueError: Se o arquivo tiver opções desconhecidas ou inválidas
+    """
+    caminho = os.path.join(diretorio, f"{nome}.json")
+    if not os.path.exists(caminho):
+        disponiveis = ", ".join(listar_perfis(diretorio)) or "nenhum"
+        raise FileNotFoundError(f"Perfil '{nome}' não encontrado (disponíveis: {disponiveis})")
+
+    with open(caminho, "r", encoding="utf-8") as f:
+        try:
+            perfil = json.load(f)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Perfil '{nome}' com JSON inválido: {e}")
+
+    desconhecidas = set(perfil) - set(OPCOES_PERFIL) - {"descricao"}
+    if desconhecidas:
+        raise ValueError(f"Perfil '{nome}' com opções desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    if "initial_prompt" in perfil and not isinstance(perfil["initial_prompt"], str):
+        raise ValueError(f"Perfil '{nome}': initial_prompt deve ser texto")
+    if "beam_size" in perfil and (not isinstance(perfil["beam_size"], int) or perfil["beam_size"] < 1):
+        raise ValueError(f"Perfil '{nome}': beam_size deve ser um inteiro >= 1")
+    temperatura = perfil.get("temperature", 0.0)
+    temperaturas = temperatura if isinstance(temperatura, list) else [temperatura]
+    if not temperaturas or not all(isinstance(t, (int, float)) and 0 <= t <= 1 for t in temperaturas):
+        raise ValueError(f"Perfil '{nome}': temperature deve ser um número ou lista de números entre 0 e 1")
+    suprimir = perfil.get("suppress_tokens", "-1")
+    if not isinstance(suprimir, str) and not (isinstance(suprimir, list) and all(isinstance(t, int) for t in suprimir)):
+        raise ValueError(f"Perfil '{nome}': suppress_tokens deve ser texto (\"-1,123\") ou lista de ids de tokens")
+
+    perfil["nome"] = nome
+    return perfil
+
+def opcoes_perfil(perfil):
+    """
+    Converte o perfil nas opções de model.transcribe
+
+    Args:
+        perfil (dict): Perfil carregado ou None
+
+    Returns:
+        dict: initial_prompt, suppress_tokens, beam_size e temperature definidos
+    """
+    if not perfil:
+        return {}
+    opcoes = {chave: perfil[chave] for chave in OPCOES_PERFIL if chave in perfil}
+    if isinstance(opcoes.get("temperature"), list):
+        opcoes["temperature"] = tuple(opcoes["temperature"])
+    return opcoes
+
+def chave_perfil(perfil):
+    """
+    Identifica o perfil nas chaves de cache de resultados
+
+    Usa o conteúdo das opções (e não só o nome): editar o arquivo do
+    perfil invalida os resultados guardados com a versão anterior.
+    """
+    if not perfil:
+        return "padrao"
+    conteudo = json.dumps(opcoes_perfil(perfil), sort_keys=True, ensure_ascii=False)
+    return f"{perfil['nome']}-{hashlib.sha1(conteudo.encode('utf-8')).hexdigest()[:8]}"
@@ -0,0 +1,268 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import shutil
+import zipfile
+from collections import OrderedDict
+from transcricao_compacta import TranscricaoCompacta
+
+# Diretório onde os resultados que saem da memória são gravados
+SESSOES_DIR = os.path.join(os.getcwd(), ".sessoes")
+
+# Quantidade de jobs mantidos em memória por sessão; os demais vão para o disco
+MAX_EM_MEMORIA = 3
+
+def gerar_id_job():
+    """Gera um identificador curto e único para um job de transcrição"""
+    return uuid.uuid4().hex[:12]
+
+def chave_resultado(conteudo_audio, **configuracao):
+    """
+    Gera a chave de cache de um resultado
+
+    Combina o conteúdo do áudio com tudo que altera a saída (modelo,
+    idioma, perfil de vocabulário, cascata, guarda, tradução), para que o
+    mesmo arquivo com outra configuração não reaproveite um resultado.
+
+    Args:
+        conteudo_audio (bytes): Bytes do arquivo de áudio
+        **configuracao: Parâmetros que influenciam a transcrição
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    h = hashlib.sha1(conteudo_audio)
+    h.update(json.dumps(configuracao, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+def criar_job(compacta, arquivo, modelo, idioma, tempo_processamento, job_id=None, traducao=None, chave=None, perfil=None):
+    """
+    Monta o registro de um job concluído, com os downloads já gerados
+
+    Os conteúdos TXT/SRT são gerados uma única vez aqui; os botões de
+    download apenas reutilizam essas strings a cada rerun.
+
+    Args:
+        compacta (TranscricaoCompacta): Resultado da transcrição
+        arquivo (str): Nome do arquivo de áudio original
+        modelo (str): Modelo usado
+        idioma (str): Idioma escolhido (ou None para automático)
+        tempo_processamento (float): Tempo gasto em segundos
+        job_id (str): Identificador do job (gerado se omitido)
+        traducao (TranscricaoCompacta): Versão em inglês alinhada (opcional)
+        chave (str): Chave de cache do resultado (ver chave_resultado)
+        perfil (str): Nome do perfil de vocabulário usado (ou None)
+
+    Returns:
+        dict: Registro do job
+    """
+    downloads = {
+        "transcricao.txt": compacta.texto_completo,
+        "legendas.srt": compacta.gerar_srt(),
+        "segmentos.txt": compacta.gerar_segmentos_txt(),
+    }
+    if traducao is not None:
+        downloads.update({
+            "en_transcricao.txt": traducao.texto_completo,
+            "en_legendas.srt": traducao.gerar_srt(),
+            "en_segmentos.txt": traducao.gerar_segmentos_txt(),
+        })
+    return {
+        "id": job_id or gerar_id_job(),
+        "arquivo": arquivo,
+        "modelo": modelo,
+        "idioma": idioma,
+        "perfil": perfil,
+        "chave": chave,
+        "tempo_processamento": tempo_processamento,
+        "criado_em": time.time(),
+        "compacta": compacta,
+        "traducao": traducao,
+        "downloads": downloads,
+    }
+
+class ArmazemResultados:
+    """
+    Guarda os jobs concluídos de uma sessão, por id
+
+    Os jobs mais recentes ficam em memória; quando passam de
+    `max_em_memoria`, os mais antigos são gravados em disco (transcrição
+    em .npz + downloads + metadados) e recarregados sob demanda.
+    """
+
+    def __init__(self, sessao_id, diretorio=SESSOES_DIR, max_em_memoria=MAX_EM_MEMORIA):
+        self.diretorio = os.path.join(diretorio, sessao_id)
+        self.max_em_memoria = max_em_memoria
+        self.em_memoria = OrderedDict()
+
+    def _pasta_job(self, job_id):
+        return os.path.join(self.diretorio, job_id)
+
+    def guardar(self, job):
+        """Adiciona um job concluído ao armazém"""
+        self.em_memoria[job["id"]] = job
+        self.em_memoria.move_to_end(job["id"])
+        while len(self.em_memoria) > self.max_em_memoria:
+            _, antigo = self.em_memoria.popitem(last=False)
+            self._gravar(antigo)
+        return job["id"]
+
+    def _gravar(self, job):
+        """Grava um job em disco e o remove da memória"""
+        pasta = self._pasta_job(job["id"])
+        os.makedirs(pasta, exist_ok=True)
+        job["compacta"].salvar(os.path.join(pasta, "transcricao.npz"))
+        if job.get("traducao") is not None:
+            job["traducao"].salvar(os.path.join(pasta, "traducao.npz"))
+        for nome, conteudo in job["downloads"].items():
+            with open(os.path.join(pasta, nome), "w", encoding="utf-8") as f:
+                f.write(conteudo)
+        metadados = {k: v for k, v in job.items() if k not in ("compacta", "traducao", "downloads")}
+        metadados["downloads"] = list(job["downloads"])
+        with open(os.path.join(pasta, "job.json"), "w", encoding="utf-8") as f:
+            json.dump(metadados, f, ensure_ascii=False)
+
+    def _ler(self, job_id):
+        """Lê um job gravado em disco"""
+        pasta = self._pasta_job(job_id)
+        with open(os.path.join(pasta, "job.json"), "r", encoding="utf-8") as f:
+            job = json.load(f)
+        job["compacta"] = TranscricaoCompacta.carregar(os.path.join(pasta, "transcricao.npz"))
+        traducao = os.path.join(pasta, "traducao.npz")
+        job["traducao"] = TranscricaoCompacta.carregar(traducao) if os.path.exists(traducao) else None
+        downloads = {}
+        for nome in job["downloads"]:
+            with open(os.path.join(pasta, nome), "r", encoding="utf-8") as f:
+                downloads[nome] = f.read()
+        job["downloads"] = downloads
+        return job
+
+    def obter(self, job_id):
+        """
+        Retorna o job pelo id, recarregando do disco se necessário
+
+        Returns:
+            dict: Registro do job ou None se não existir
+        """
+        if job_id in self.em_memoria:
+            self.em_memoria.move_to_end(job_id)
+            return self.em_memoria[job_id]
+        if not os.path.exists(os.path.join(self._pasta_job(job_id), "job.json")):
+            return None
+        job = self._ler(job_id)
+        shutil.rmtree(self._pasta_job(job_id), ignore_errors=True)
+        self.guardar(job)
+        return job
+
+    def procurar(self, chave):
+        """
+        Procura um job já concluído com a mesma chave de cache
+
+        Returns:
+            str: Id do job ou None se não houver
+        """
+        if not chave:
+            return None
+        for job in self.em_memoria.values():
+            if job.get("chave") == chave:
+                return job["id"]
+        if os.path.exists(self.diretorio):
+            for job_id in os.listdir(self.diretorio):
+                caminho = os.path.join(self.diretorio, job_id, "job.json")
+                if not os.path.exists(caminho):
+                    continue
+                with open(caminho, "r", encoding="utf-8") as f:
+                    if json.load(f).get("chave") == chave:
+                        return job_id
+        return None
+
+    def listar(self):
+        """Lista (id, arquivo, modelo, criado_em) de todos os jobs, do mais recente ao mais antigo"""
+        jobs = [(j["id"], j["arquivo"], j["modelo"], j["criado_em"]) for j in self.em_memoria.values()]
+        if os.path.exists(self.diretorio):
+            for job_id in os.listdir(self.diretorio):
+                caminho = os.path.join(self.diretorio, job_id, "job.json")
+                if job_id in self.em_memoria or not os.path.exists(caminho):
+                    continue
+                with open(caminho, "r", encoding="utf-8") as f:
+                    j = json.load(f)
+                jobs.append((j["id"], j["arquivo"], j["modelo"], j["criado_em"]))
+        return sorted(jobs, key=lambda j: j[3], reverse=True)
+
+    def descarregar(self, manter=None):
+        """Grava em disco todos os jobs em memória, exceto o id em `manter`"""
+        for job_id in list(self.em_memoria):
+            if job_id != manter:
+                self._gravar(self.em_memoria.pop(job_id))
+
+    def exportar_zip(self, ids, nome="lote.zip"):
+        """
+        Grava os downloads dos jobs em um ZIP dentro da pasta da sessão
+
+        O arquivo é escrito entrada por entrada: jobs já gravados em disco
+        são copiados direto dos arquivos, e os que estão em memória são
+        escritos em blocos, sem montar o ZIP inteiro na memória.
+
+        Args:
+            ids (list): Ids dos jobs a incluir
+            nome (str): Nome do arquivo ZIP
+
+        Returns:
+            str: Caminho do ZIP gerado
+        """
+        os.makedirs(self.diretorio, exist_ok=True)
+        caminho = os.path.join(self.diretorio, nome)
+        usados = set()
+        with zipfile.ZipFile(caminho, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for job_id in ids:
+                job = self.em_memoria.get(job_id)
+                pasta = self._pasta_job(job_id)
+                if job is None:
+                    if not os.path.exists(os.path.join(pasta, "job.json")):
+                        continue
+                    with open(os.path.join(pasta, "job.json"), "r", encoding="utf-8") as f:
+                        job = json.load(f)
+
+                # Arquivos com o mesmo nome em jobs diferentes ganham o id como sufixo
+                base = os.path.splitext(job["arquivo"])[0]
+                if base in usados:
+                    base = f"{base}_{job_id}"
+                usados.add(base)
+
+                for download in job["downloads"]:
+                    destino = f"{base}_{download}"
+                    if isinstance(job["downloads"], dict):
+                        conteudo = job["downloads"][download]
+                        with zf.open(destino, "w") as saida:
+                            for i in range(0, len(conteudo), 1024 * 1024):
+                                saida.write(conteudo[i:i + 1024 * 1024].encode("utf-8"))
+                    else:
+                        zf.write(os.path.join(pasta, download), destino)
+        return caminho
+
+    def limpar(self):
+        """Remove todos os jobs da sessão (memória e disco)"""
+        self.em_memoria.clear()
+        shutil.rmtree(self.diretorio, ignore_errors=True)
+
+def limpar_sessoes_antigas(idade_maxima=86400, diretorio=SESSOES_DIR):
+    """
+    Remove as pastas de sessões não modificadas há mais de `idade_maxima` segundos
+
+    Returns:
+        int: Quantidade de sessões removidas
+    """
+    if not os.path.exists(diretorio):
+        return 0
+    removidas = 0
+    for sessao in os.listdir(diretorio):
+        caminho = os.path.join(diretorio, sessao)
+        try:
+            if time.time() - os.path.getmtime(caminho) > idade_maxima:
+                shutil.rmtree(caminho)
+                removidas += 1
+        except OSError:
+            pass
+    return removidas
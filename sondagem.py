@@ -0,0 +1,175 @@
+import os
+import json
+import subprocess
+import statistics
+
+# Duração máxima aceita para um job (segundos)
+DURACAO_MAXIMA_SEGUNDOS = 4 * 3600
+
+# Fator de tempo real padrão (tempo de processamento / duração do áudio) em CPU,
+# usado enquanto não houver histórico suficiente para o modelo
+FATOR_TEMPO_REAL_PADRAO = {
+    "tiny": 0.05,
+    "base": 0.1,
+    "small": 0.3,
+    "medium": 0.8,
+    "large": 1.5,
+}
+
+# Arquivo com o histórico de fatores de tempo real medidos por modelo
+ARQUIVO_HISTORICO = os.path.join(os.getcwd(), ".historico_rtf.json")
+
+# Quantidade de medições mantidas por modelo
+HISTORICO_MAXIMO = 20
+
+def localizar_ffprobe():
+    """Retorna o ffprobe local (bin/) se existir, senão o do sistema"""
+    local_ffprobe = os.path.join(os.getcwd(), "bin", "ffprobe")
+    if os.path.exists(local_ffprobe):
+        return local_ffprobe
+    return "ffprobe"
+
+def sondar_audio(caminho_audio):
+    """
+    Lê duração, taxa de amostragem, canais e codec sem decodificar o áudio
+
+    Args:
+        caminho_audio (str): Caminho para o arquivo de áudio
+
+    Returns:
+        dict: duracao (s), sample_rate, canais, codec e formato do arquivo
+
+    Raises:
+        RuntimeError: Se o ffprobe falhar ou não estiver disponível
+        ValueError: Se o arquivo não tiver nenhuma trilha de áudio
+    """
+    comando = [
+        localizar_ffprobe(), "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration,format_name:stream=codec_name,sample_rate,channels,duration",
+        "-of", "json",
+        caminho_audio,
+    ]
+    try:
+        saida = subprocess.run(comando, capture_output=True, check=True, text=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("ffprobe não encontrado (instale o ffmpeg)")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"ffprobe falhou: {e.stderr.strip()}")
+
+    dados = json.loads(saida)
+    trilhas = dados.get("streams", [])
+    if not trilhas:
+        raise ValueError("Nenhuma trilha de áudio encontrada no arquivo")
+
+    trilha = trilhas[0]
+    formato = dados.get("format", {})
+    duracao = formato.get("duration") or trilha.get("duration") or 0
+
+    return {
+        "duracao": float(duracao),
+        "sample_rate": int(trilha.get("sample_rate", 0)),
+        "canais": int(trilha.get("channels", 0)),
+        "codec": trilha.get("codec_name", "desconhecido"),
+        "formato": formato.get("format_name", "desconhecido"),
+    }
+
+def carregar_historico():
+    """Carrega o histórico de fatores de tempo real por modelo"""
+    if not os.path.exists(ARQUIVO_HISTORICO):
+        return {}
+    try:
+        with open(ARQUIVO_HISTORICO, "r") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+def registrar_tempo(modelo, duracao_audio, tempo_processamento):
+    """
+    Registra o fator de tempo real de uma transcrição concluída
+
+    Args:
+        modelo (str): Modelo usado
+        duracao_audio (float): Duração do áudio em segundos
+        tempo_processamento (float): Tempo gasto na transcrição em segundos
+    """
+    if duracao_audio <= 0:
+        return
+
+    historico = carregar_historico()
+    medicoes = historico.get(modelo, [])
+    medicoes.append(tempo_processamento / duracao_audio)
+    historico[modelo] = medicoes[-HISTORICO_MAXIMO:]
+
+    # Vários workers podem gravar ao mesmo tempo: arquivo temporário + rename
+    # para que um leitor nunca encontre o JSON pela metade
+    temporario = f"{ARQUIVO_HISTORICO}.{os.getpid()}.tmp"
+    try:
+        with open(temporario, "w") as f:
+            json.dump(historico, f)
+        os.replace(temporario, ARQUIVO_HISTORICO)
+    except OSError:
+        pass
+
+def fator_tempo_real(modelo):
+    """Retorna a mediana dos fatores medidos para o modelo ou o valor padrão"""
+    medicoes = carregar_historico().get(modelo)
+    if medicoes:
+        return statistics.median(medicoes)
+    return FATOR_TEMPO_REAL_PADRAO.get(modelo, 1.0)
+
+def estimar_tempo(duracao_audio, modelo):
+    """Estima o tempo de processamento (segundos) de um áudio com o modelo dado"""
+    return duracao_audio * fator_tempo_real(modelo)
+
+def avaliar_job(info, modelo, duracao_maxima=DURACAO_MAXIMA_SEGUNDOS, tempo_maximo=None):
+    """
+    Decide se um job deve ser aceito e com qual modelo
+
+    Args:
+        info (dict): Resultado de sondar_audio
+        modelo (str): Modelo desejado
+        duracao_maxima (float): Duração máxima aceita em segundos
+        tempo_maximo (float): Tempo de processamento máximo desejado; se a
+            estimativa passar disso, o job é roteado para um modelo mais rápido
+
+    Returns:
+        dict: aceito (bool), modelo, estimativa (s) e motivo (str ou None)
+    """
+    duracao = info["duracao"]
+
+    if duracao > duracao_maxima:
+        return {
+            "aceito": False,
+            "modelo": modelo,
+            "estimativa": estimar_tempo(duracao, modelo),
+            "motivo": f"Áudio de {duracao / 60:.0f} min excede o limite de {duracao_maxima / 60:.0f} min",
+        }
+
+    modelos = list(FATOR_TEMPO_REAL_PADRAO)
+    escolhido = modelo
+    if tempo_maximo is not None:
+        for candidato in reversed(modelos[:modelos.index(modelo) + 1]):
+            escolhido = candidato
+            if estimar_tempo(duracao, candidato) <= tempo_maximo:
+                break
+
+    motivo = None
+    if escolhido != modelo:
+        motivo = f"Estimativa com '{modelo}' excede {tempo_maximo:.0f}s; usando '{escolhido}'"
+
+    return {
+        "aceito": True,
+        "modelo": escolhido,
+        "estimativa": estimar_tempo(duracao, escolhido),
+        "motivo": motivo,
+    }
+
+def formatar_duracao(segundos):
+    """Formata segundos como HH:MM:SS ou MM:SS"""
+    segundos = int(segundos)
+    horas, resto = divmod(segundos, 3600)
+    minutos, segs = divmod(resto, 60)
+    if horas:
+        return f"{horas:d}:{minutos:02d}:{segs:02d}"
+    return f"{minutos:02d}:{segs:02d}"
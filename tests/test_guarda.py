@@ -0,0 +1,70 @@
+import os
+import sys
+import dataclasses
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from guarda import GuardaAlucinacao
+
+@dataclasses.dataclass
+class Opcoes:
+    task: str = "transcribe"
+    prompt: object = None
+    temperature: float = 0.0
+
+@dataclasses.dataclass
+class Resultado:
+    text: str
+    compression_ratio: float = 1.2
+    no_speech_prob: float = 0.01
+    avg_logprob: float = -0.3
+
+FRASE = "o relatório trimestral mostra crescimento nas vendas do sul"
+
+def decode_fixo(texto):
+    return lambda mel, options: Resultado(texto)
+
+def test_fallback_da_mesma_janela_nao_e_cortado():
+    guarda = GuardaAlucinacao()
+    decode = guarda.envolver(decode_fixo(FRASE))
+    mel = object()
+
+    # Primeira tentativa rejeitada pelo Whisper (t=0.0) e nova tentativa (t=0.2) no mesmo mel
+    decode(mel, Opcoes(temperature=0.0))
+    resultado = decode(mel, Opcoes(temperature=0.2))
+
+    assert resultado.no_speech_prob < 1.0
+    assert guarda.eventos == []
+
+def test_repeticao_entre_janelas_continua_cortada():
+    guarda = GuardaAlucinacao()
+    decode = guarda.envolver(decode_fixo(FRASE))
+
+    decode(object(), Opcoes())
+    resultado = decode(object(), Opcoes())
+
+    assert resultado.no_speech_prob == 1.0
+    assert len(guarda.eventos) == 1
+
+def test_so_a_ultima_tentativa_entra_no_historico():
+    textos = iter([FRASE, "uma frase completamente diferente sobre outro assunto qualquer", FRASE])
+    guarda = GuardaAlucinacao()
+    decode = guarda.envolver(lambda mel, options: Resultado(next(textos)))
+    mel = object()
+
+    decode(mel, Opcoes(temperature=0.0))
+    decode(mel, Opcoes(temperature=0.2))
+    # A primeira tentativa foi descartada pelo Whisper: a frase não deve contar como vista
+    resultado = decode(object(), Opcoes())
+
+    assert resultado.no_speech_prob < 1.0
+
+def test_tarefas_tem_historicos_separados():
+    guarda = GuardaAlucinacao()
+    decode = guarda.envolver(decode_fixo(FRASE))
+    mel = object()
+
+    decode(mel, Opcoes(task="transcribe"))
+    resultado = decode(mel, Opcoes(task="translate"))
+
+    assert resultado.no_speech_prob < 1.0
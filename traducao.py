@@ -0,0 +1,220 @@
+import torch
+from whisper.audio import N_FRAMES, HOP_LENGTH, SAMPLE_RATE, pad_or_trim
+from whisper.decoding import DecodingOptions
+from whisper.tokenizer import get_tokenizer
+from espectrograma import calcular_mel
+
+# Temperaturas tentadas em sequência quando a decodificação parece ruim (mesmas do Whisper)
+TEMPERATURAS = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Critérios de fallback/silêncio (padrões do model.transcribe)
+LIMIAR_COMPRESSAO = 2.4
+LIMIAR_LOGPROB = -1.0
+LIMIAR_SEM_FALA = 0.6
+
+# Quadros do log-mel por segundo de áudio
+QUADROS_POR_SEGUNDO = SAMPLE_RATE // HOP_LENGTH
+
+def _decodificar(model, features, temperaturas, **opcoes):
+    """
+    Decodifica uma janela já codificada, subindo a temperatura se necessário
+
+    Como `features` já é a saída do encoder, cada tentativa (e cada tarefa)
+    roda só o decoder.
+    """
+    for temperatura in temperaturas:
+        kwargs = dict(opcoes)
+        if temperatura > 0:
+            kwargs.pop("beam_size", None)
+            kwargs.pop("patience", None)
+        else:
+            kwargs.pop("best_of", None)
+        resultado = model.decode(features, DecodingOptions(temperature=temperatura, **kwargs))[0]
+
+        if resultado.no_speech_prob > LIMIAR_SEM_FALA:
+            break
+        if resultado.compression_ratio <= LIMIAR_COMPRESSAO and resultado.avg_logprob >= LIMIAR_LOGPROB:
+            break
+    return resultado
+
+def _sem_fala(resultado):
+    """Mesma regra do model.transcribe para pular janelas de silêncio"""
+    return resultado.no_speech_prob > LIMIAR_SEM_FALA and resultado.avg_logprob < LIMIAR_LOGPROB
+
+def _segmentos_da_janela(tokenizer, resultado, segundos_por_token, duracao_janela):
+    """
+    Divide os tokens de uma janela em segmentos pelos tokens de timestamp
+
+    Returns:
+        tuple: (segmentos fechados, segmento pendente ou None, fim do último
+            segmento fechado ou None), com tempos relativos à janela
+    """
+    segmentos = []
+    texto = []
+    inicio = 0.0
+    fechado = None
+    for token in resultado.tokens:
+        if token >= tokenizer.timestamp_begin:
+            # A última janela é completada com silêncio; timestamps não passam do fim do áudio
+            tempo = min((token - tokenizer.timestamp_begin) * segundos_por_token, duracao_janela)
+            if texto:
+                segmentos.append((inicio, tempo, texto))
+                texto = []
+                fechado = tempo
+            inicio = tempo
+        elif token < tokenizer.eot:
+            texto.append(token)
+    pendente = (inicio, None, texto) if texto else None
+    return segmentos, pendente, fechado
+
+def _consumido(pendente, fechado, duracao_janela):
+    """Até onde a janela pode avançar para uma tarefa (mesma regra do model.transcribe)"""
+    if pendente and fechado is not None:
+        return fechado
+    return duracao_janela
+
+def _fronteira_comum(tarefas, limite):
+    """
+    Recua o ponto de corte até nenhum segmento descartado começar antes dele
+
+    Um segmento que atravessa o corte é descartado e decodificado de novo
+    a partir do corte; se começasse antes, o trecho entre o início dele e o
+    corte se perderia. Se o recuo chegar ao início da janela, mantém o
+    limite original para a janela continuar avançando.
+    """
+    corte = limite
+    while corte > 0:
+        inicios = [inicio for fechados in tarefas for inicio, fim, _ in fechados if fim > corte and inicio < corte]
+        if not inicios:
+            return corte
+        corte = min(inicios)
+    return limite
+
+def _montar(tokenizer, segmentos, seek, deslocamento, resultado):
+    """Converte (início, fim, tokens) no formato de segmento do Whisper"""
+    return [{
+        "seek": seek,
+        "start": round(deslocamento + inicio, 3),
+        "end": round(deslocamento + fim, 3),
+        "text": tokenizer.decode(tokens),
+        "tokens": tokens,
+        "temperature": resultado.temperature,
+        "avg_logprob": resultado.avg_logprob,
+        "compression_ratio": resultado.compression_ratio,
+        "no_speech_prob": resultado.no_speech_prob,
+    } for inicio, fim, tokens in segmentos]
+
+def _finalizar(segmentos, idioma):
+    for i, segmento in enumerate(segmentos):
+        segmento["id"] = i
+    return {"text": "".join(s["text"] for s in segmentos), "segments": segmentos, "language": idioma}
+
+def transcrever_e_traduzir(model, caminho_audio, idioma="pt", initial_prompt=None, temperature=TEMPERATURAS, **opcoes):
+    """
+    Transcreve e traduz para o inglês em uma única passada pelo encoder
+
+    Para cada janela de 30s o encoder roda uma vez (model.embed_audio) e a
+    mesma saída é decodificada duas vezes: com task="transcribe" e com
+    task="translate". Cada tarefa gera os próprios timestamps; a janela
+    avança até o último timestamp fechado que as duas têm em comum (o
+    menor entre eles) e de cada tarefa ficam só os segmentos que terminam
+    até esse ponto. O resto é decodificado de novo na janela seguinte, sem
+    perder nem repetir texto na fronteira.
+
+    Args:
+        model: Modelo Whisper multilíngue já carregado
+        caminho_audio (str | np.ndarray): Caminho do arquivo ou amostras do áudio
+        idioma (str): Código do idioma do áudio ou None para detectar
+        initial_prompt (str): Texto inicial usado como contexto nas duas tarefas
+        temperature (float | tuple): Temperatura ou sequência de fallback
+        **opcoes: Repassadas para DecodingOptions (beam_size, suppress_tokens...)
+
+    Returns:
+        dict: Resultado da transcrição no formato do model.transcribe, com a
+            chave extra "traducao" contendo o resultado em inglês
+    """
+    if not model.is_multilingual:
+        raise ValueError("A tradução exige um modelo multilíngue")
+
+    temperaturas = (temperature,) if isinstance(temperature, (int, float)) else tuple(temperature)
+    fp16 = model.device.type != "cpu"
+    opcoes = {"fp16": fp16, **opcoes}
+
+    # Log-mel do arquivo inteiro (compartilhado com o cache de espectrogramas)
+    mel = calcular_mel(caminho_audio, model.dims.n_mels)
+    quadros = mel.shape[-1] - N_FRAMES
+    segundos_por_token = (N_FRAMES // model.dims.n_audio_ctx) / QUADROS_POR_SEGUNDO
+    limite_prompt = model.dims.n_text_ctx // 2 - 1
+
+    tokenizer = None
+    prompts = {"transcribe": [], "translate": []}
+    segmentos = {"transcribe": [], "translate": []}
+
+    seek = 0
+    while seek < quadros:
+        tamanho = min(N_FRAMES, quadros - seek)
+        deslocamento = seek / QUADROS_POR_SEGUNDO
+        duracao_janela = tamanho / QUADROS_POR_SEGUNDO
+        janela = pad_or_trim(mel[:, seek:seek + tamanho], N_FRAMES)
+        janela = janela.to(model.device).to(torch.float16 if fp16 else torch.float32)
+
+        # O encoder roda uma única vez por janela
+        features = model.embed_audio(janela.unsqueeze(0))
+
+        if tokenizer is None:
+            if idioma is None:
+                _, probabilidades = model.detect_language(features)
+                idioma = max(probabilidades[0], key=probabilidades[0].get)
+            tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages, language=idioma)
+            if initial_prompt:
+                inicial = tokenizer.encode(" " + initial_prompt.strip())
+                prompts = {"transcribe": list(inicial), "translate": list(inicial)}
+
+        resultados = {
+            tarefa: _decodificar(model, features, temperaturas, task=tarefa, language=idioma,
+                                 prompt=prompts[tarefa], **opcoes)
+            for tarefa in ("transcribe", "translate")
+        }
+
+        original = resultados["transcribe"]
+        if _sem_fala(original):
+            seek += tamanho
+            continue
+
+        # A janela avança só até onde as duas tarefas fecharam segmentos
+        janelas = {}
+        consumido = duracao_janela
+        for tarefa, resultado in resultados.items():
+            if tarefa == "translate" and _sem_fala(resultado):
+                continue
+            fechados, pendente, fechado = _segmentos_da_janela(tokenizer, resultado, segundos_por_token, duracao_janela)
+            janelas[tarefa] = (fechados, pendente)
+            consumido = min(consumido, _consumido(pendente, fechado, duracao_janela))
+
+        # O pendente só entra quando a janela inteira foi consumida
+        for fechados, pendente in janelas.values():
+            if pendente and consumido >= duracao_janela:
+                fechados.append((pendente[0], duracao_janela, pendente[2]))
+            elif pendente:
+                fechados.append((pendente[0], float("inf"), pendente[2]))
+        consumido = _fronteira_comum([fechados for fechados, _ in janelas.values()], consumido)
+
+        # De cada tarefa ficam os segmentos que terminam até esse ponto
+        novos = {"transcribe": [], "translate": []}
+        for tarefa, (fechados, _) in janelas.items():
+            novos[tarefa] = [(inicio, fim, tokens) for inicio, fim, tokens in fechados if fim <= consumido]
+
+        for tarefa, resultado in resultados.items():
+            montados = _montar(tokenizer, novos[tarefa], seek, deslocamento, resultado)
+            segmentos[tarefa].extend(montados)
+            if resultado.temperature > 0.5:
+                prompts[tarefa] = []
+            else:
+                # O decoder usa só a metade final do contexto como prompt
+                prompts[tarefa] = (prompts[tarefa] + [t for s in montados for t in s["tokens"]])[-limite_prompt:]
+
+        seek += max(1, round(consumido * QUADROS_POR_SEGUNDO))
+
+    resultado = _finalizar(segmentos["transcribe"], idioma)
+    resultado["traducao"] = _finalizar(segmentos["translate"], "en")
+    return resultado
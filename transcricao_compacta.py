@@ -0,0 +1,161 @@
+import json
+import numpy as np
+
+# Segmentos por página na tabela da interface
+SEGMENTOS_POR_PAGINA = 100
+
+def formatar_tempo_srt(segundos):
+    """Converte segundos para o formato de tempo do SRT (HH:MM:SS,mmm)"""
+    return f"{int(segundos//3600):02d}:{int((segundos%3600)//60):02d}:{int(segundos%60):02d},{int((segundos%1)*1000):03d}"
+
+class TranscricaoCompacta:
+    """
+    Representação colunar de uma transcrição longa
+
+    Em vez de uma lista de dicts por segmento (com tokens, floats e texto),
+    guarda arrays paralelos de início/fim/probabilidades e um único buffer
+    de texto com os offsets de cada segmento. O custo de memória por
+    segmento fica em poucas dezenas de bytes mais o próprio texto.
+    """
+
+    def __init__(self, inicio, fim, avg_logprob, no_speech_prob, compression_ratio, texto, offsets, metadados=None):
+        self.inicio = inicio
+        self.fim = fim
+        self.avg_logprob = avg_logprob
+        self.no_speech_prob = no_speech_prob
+        self.compression_ratio = compression_ratio
+        self.texto = texto
+        self.offsets = offsets
+        self.metadados = metadados or {}
+
+    @classmethod
+    def de_resultado(cls, resultado):
+        """
+        Cria a representação compacta a partir do resultado de model.transcribe
+
+        Args:
+            resultado (dict): Resultado da transcrição do Whisper
+
+        Returns:
+            TranscricaoCompacta: Transcrição compacta (os tokens são descartados)
+        """
+        segmentos = resultado["segments"]
+        n = len(segmentos)
+
+        def coluna(chave, tipo=np.float32):
+            return np.fromiter((s.get(chave, 0.0) for s in segmentos), dtype=tipo, count=n)
+
+        textos = [s["text"] for s in segmentos]
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in textos], out=offsets[1:])
+
+        # Tudo que não é segmento (idioma, modelo, cascata, guarda...) vira metadado
+        metadados = {k: v for k, v in resultado.items() if k not in ("segments", "text")}
+
+        return cls(
+            inicio=coluna("start", np.float64),
+            fim=coluna("end", np.float64),
+            avg_logprob=coluna("avg_logprob"),
+            no_speech_prob=coluna("no_speech_prob"),
+            compression_ratio=coluna("compression_ratio"),
+            texto="".join(textos),
+            offsets=offsets,
+            metadados=metadados,
+        )
+
+    def __len__(self):
+        return len(self.inicio)
+
+    @property
+    def duracao(self):
+        return float(self.fim[-1]) if len(self) else 0.0
+
+    @property
+    def texto_completo(self):
+        return self.texto.strip()
+
+    def texto_segmento(self, i):
+        """Texto do segmento i (sem espaços nas pontas)"""
+        return self.texto[self.offsets[i]:self.offsets[i + 1]].strip()
+
+    def pagina(self, numero, tamanho=SEGMENTOS_POR_PAGINA):
+        """
+        Colunas "#", "Início", "Fim" e "Texto" de uma página de segmentos
+
+        Só os segmentos da página viram objetos Python; o resto continua
+        nos arrays.
+
+        Args:
+            numero (int): Página (começando em 0)
+            tamanho (int): Segmentos por página
+
+        Returns:
+            dict: Colunas da página, para st.dataframe
+        """
+        ini = numero * tamanho
+        fim = min(ini + tamanho, len(self))
+        return {
+            "#": list(range(ini + 1, fim + 1)),
+            "Início": [f"{int(t//60):02d}:{int(t%60):02d}" for t in self.inicio[ini:fim]],
+            "Fim": [f"{int(t//60):02d}:{int(t%60):02d}" for t in self.fim[ini:fim]],
+            "Texto": [self.texto_segmento(i) for i in range(ini, fim)],
+        }
+
+    def total_paginas(self, tamanho=SEGMENTOS_POR_PAGINA):
+        return max(1, -(-len(self) // tamanho))
+
+    def linhas_segmentos(self):
+        """Gera as linhas "N. [MM:SS - MM:SS] texto" de cada segmento"""
+        for i in range(len(self)):
+            inicio = int(self.inicio[i])
+            fim = int(self.fim[i])
+            yield f"{i + 1:2d}. [{inicio//60:02d}:{inicio%60:02d} - {fim//60:02d}:{fim%60:02d}] {self.texto_segmento(i)}\n"
+
+    def linhas_srt(self):
+        """Gera os blocos SRT de cada segmento"""
+        for i in range(len(self)):
+            yield (f"{i + 1}\n"
+                   f"{formatar_tempo_srt(self.inicio[i])} --> {formatar_tempo_srt(self.fim[i])}\n"
+                   f"{self.texto_segmento(i)}\n\n")
+
+    def gerar_srt(self):
+        """Conteúdo SRT completo"""
+        return "".join(self.linhas_srt())
+
+    def gerar_segmentos_txt(self):
+        """Conteúdo TXT com os segmentos e timestamps"""
+        return "".join(self.linhas_segmentos())
+
+    def salvar(self, caminho):
+        """
+        Salva a transcrição em um arquivo .npz compactado
+
+        O texto é gravado como bytes UTF-8; os offsets continuam em
+        caracteres, então o texto é decodificado de volta ao carregar.
+        """
+        np.savez_compressed(
+            caminho,
+            inicio=self.inicio,
+            fim=self.fim,
+            avg_logprob=self.avg_logprob,
+            no_speech_prob=self.no_speech_prob,
+            compression_ratio=self.compression_ratio,
+            texto=np.frombuffer(self.texto.encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            metadados=np.frombuffer(json.dumps(self.metadados, ensure_ascii=False, default=str).encode("utf-8"), dtype=np.uint8),
+        )
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Carrega uma transcrição salva com salvar()"""
+        with np.load(caminho) as dados:
+            return cls(
+                inicio=dados["inicio"],
+                fim=dados["fim"],
+                avg_logprob=dados["avg_logprob"],
+                no_speech_prob=dados["no_speech_prob"],
+                compression_ratio=dados["compression_ratio"],
+                texto=dados["texto"].tobytes().decode("utf-8"),
+                offsets=dados["offsets"],
+                metadados=json.loads(dados["metadados"].tobytes().decode("utf-8")),
+            )